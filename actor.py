@@ -1,10 +1,9 @@
 from pygame.math import Vector2
 
 class MyActor():
+    # Plain simulation entity. Holds the sprite name and anchor the renderer should use,
+    # but has no dependency on Pygame Zero so matches can run without a window.
     def __init__(self, img, x=0, y=0, anchor=None):
-        super().__init__(img, (0, 0), anchor=anchor)
+        self.image = img
+        self.anchor = anchor
         self.vpos = Vector2(x, y)
-
-    def draw(self, offset_x, offset_y):
-        self.pos = (self.vpos.x - offset_x, self.vpos.y - offset_y)
-        super().draw()
\ No newline at end of file
@@ -0,0 +1,99 @@
+import json
+import os
+import sys
+
+import pygame
+
+# Images in images/ no wider or taller than this are packed into the atlas. Larger ones (the pitch
+# and the full-screen menus) gain little from packing and would waste most of the sheet.
+MAX_PACKED_SIZE = 256
+ATLAS_WIDTH = 1024
+PADDING = 1
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+IMAGE_DIR = os.path.join(ROOT, "images")
+ATLAS_DIR = os.path.join(ROOT, "atlas")
+
+
+def pack(sizes, width):
+    # Shelf packing: tallest images first, each placed to the right of the last one on the current
+    # shelf, starting a new shelf below when it doesn't fit. Returns {name: (x, y)} and the total
+    # height used.
+    positions = {}
+    x = y = shelf_height = 0
+
+    for name in sorted(sizes, key=lambda n: (-sizes[n][1], -sizes[n][0], n)):
+        w, h = sizes[name]
+        if x + w > width:
+            x = 0
+            y += shelf_height + PADDING
+            shelf_height = 0
+        positions[name] = (x, y)
+        x += w + PADDING
+        shelf_height = max(shelf_height, h)
+
+    return positions, y + shelf_height
+
+
+def build(image_dir=IMAGE_DIR, atlas_dir=ATLAS_DIR):
+    # Pack every small PNG in image_dir into atlas_dir/atlas.png, and write the rectangle of each,
+    # keyed by the name Pygame Zero would use for it, to atlas_dir/atlas.json
+    surfaces = {}
+    for filename in sorted(os.listdir(image_dir)):
+        name, ext = os.path.splitext(filename)
+        if ext.lower() == ".png":
+            surf = pygame.image.load(os.path.join(image_dir, filename))
+            if surf.get_width() <= MAX_PACKED_SIZE and surf.get_height() <= MAX_PACKED_SIZE:
+                surfaces[name] = surf
+
+    positions, height = pack({name: surf.get_size() for name, surf in surfaces.items()}, ATLAS_WIDTH)
+
+    sheet = pygame.Surface((ATLAS_WIDTH, height), pygame.SRCALPHA)
+    sheet.fill((0, 0, 0, 0))
+    frames = {}
+    for name, (x, y) in positions.items():
+        sheet.blit(surfaces[name], (x, y))
+        frames[name] = [x, y, surfaces[name].get_width(), surfaces[name].get_height()]
+
+    os.makedirs(atlas_dir, exist_ok=True)
+    pygame.image.save(sheet, os.path.join(atlas_dir, "atlas.png"))
+    with open(os.path.join(atlas_dir, "atlas.json"), "w") as f:
+        json.dump({"image": "atlas.png", "frames": frames}, f, indent=1, sort_keys=True)
+
+    return frames, (ATLAS_WIDTH, height)
+
+
+class Images:
+    # Drop-in replacement for Pygame Zero's images.load(name), with every image loaded up front so
+    # nothing is read from disk the first time it's drawn. If the atlas has been built, its images
+    # are subsurfaces of one sheet, read and converted once; anything not in the atlas (or
+    # everything, if there is no atlas) is loaded individually.
+    # Converting requires a display mode to have been set.
+    def __init__(self, image_dir=IMAGE_DIR, atlas_dir=ATLAS_DIR):
+        self.surfaces = {}
+
+        filenames = [f for f in os.listdir(image_dir) if os.path.splitext(f)[1].lower() == ".png"]
+
+        # An atlas older than any of the images may be missing changes to them, so it's ignored
+        index_path = os.path.join(atlas_dir, "atlas.json")
+        if os.path.exists(index_path) and os.path.getmtime(index_path) >= \
+                max(os.path.getmtime(os.path.join(image_dir, f)) for f in filenames):
+            with open(index_path) as f:
+                index = json.load(f)
+            sheet = pygame.image.load(os.path.join(atlas_dir, index["image"])).convert_alpha()
+            for name, rect in index["frames"].items():
+                self.surfaces[name] = sheet.subsurface(pygame.Rect(rect))
+
+        for filename in filenames:
+            name = os.path.splitext(filename)[0]
+            if name not in self.surfaces:
+                self.surfaces[name] = pygame.image.load(os.path.join(image_dir, filename)).convert_alpha()
+
+    def load(self, name):
+        return self.surfaces[name]
+
+
+if __name__ == "__main__":
+    # python atlas.py - rebuild atlas/ from images/. Run again after adding or changing an image.
+    frames, size = build(*sys.argv[1:3])
+    print("Packed {0} images into a {1}x{2} atlas".format(len(frames), *size))
@@ -1,61 +1,84 @@
+import math
 from pygame.math import Vector2
 import constant
-import game
+import kinematics
+import util
 from actor import MyActor
 from player import Player
+from trajectory import Trajectory
 
 class Ball(MyActor):
-    def __init__(self):
-        super().__init__("ball", constant.HALF_LEVEL_W, constant.HALF_LEVEL_H)
+    def __init__(self, game):
+        super().__init__("ball", game.pitch.half_level_w, game.pitch.half_level_h)
         self.vel = Vector2(0, 0)
 
+        self.game = game
+
         self.owner = None
         self.timer = 0
 
+        self.cached_trajectory = None
+
         self.shadow = MyActor("balls")
 
     def collide(self, p):
-        return p.timer < 0 and (p.vpos - self.vpos).length() <= constant.DRIBBLE_DIST_X
+        if p.timer >= 0:
+            return False
+        dx = p.vpos.x - self.vpos.x
+        dy = p.vpos.y - self.vpos.y
+        return math.sqrt(dx * dx + dy * dy) <= constant.DRIBBLE_DIST_X
+
+    def trajectory(self):
+        # Predicted path of the ball from its current state, built on first use each tick and
+        # shared by every player working out where to intercept it
+        if self.cached_trajectory is None:
+            self.cached_trajectory = Trajectory(self.vpos, self.vel, self.game.pitch)
+        return self.cached_trajectory
 
     def update(self):
+        game = self.game
+
+        self.cached_trajectory = None
+
         self.timer -= 1
 
+        # Updated in place, on floats, as in Player.update
+        pos = self.vpos
+        vel = self.vel
+
         if self.owner:
-            new_x = game.avg(self.vpos.x, self.owner.vpos.x + constant.DRIBBLE_DIST_X * game.sin(self.owner.dir))
-            new_y = game.avg(self.vpos.y, self.owner.vpos.y - constant.DRIBBLE_DIST_Y * game.cos(self.owner.dir))
+            owner_dir = self.owner.dir
+            new_x = util.avg(pos.x, self.owner.vpos.x + constant.DRIBBLE_DIST_X * util.SIN[owner_dir])
+            new_y = util.avg(pos.y, self.owner.vpos.y - constant.DRIBBLE_DIST_Y * util.COS[owner_dir])
 
-            if game.on_pitch(new_x, new_y):
-                self.vpos = Vector2(new_x, new_y)
+            if game.pitch.on_pitch(new_x, new_y):
+                pos.x = new_x
+                pos.y = new_y
             else:
                 self.owner.timer = 60
 
-                self.vel = game.angle_to_vec(self.owner.dir) * 3
+                vx, vy = util.DIRECTIONS[owner_dir]
+                vel.x = vx * 3
+                vel.y = vy * 3
 
                 self.owner = None
         else:
-            if abs(self.vpos.y - constant.HALF_LEVEL_H) > constant.HALF_PITCH_H:
-                bounds_x = constant.GOAL_BOUNDS_X
-            else:
-                bounds_x = constant.PITCH_BOUNDS_X
-
-            if abs(self.vpos.x - constant.HALF_LEVEL_W) < constant.HALF_GOAL_W:
-                bounds_y = constant.GOAL_BOUNDS_Y
-            else:
-                bounds_y = constant.PITCH_BOUNDS_Y
+            bounds_x, bounds_y = game.pitch.ball_bounds(pos.x, pos.y)
 
-            self.vpos.x, self.vel.x = game.ball_physics(self.vpos.x, self.vel.x, bounds_x)
-            self.vpos.y, self.vel.y = game.ball_physics(self.vpos.y, self.vel.y, bounds_y)
+            pos.x, vel.x = util.ball_physics(pos.x, vel.x, bounds_x)
+            pos.y, vel.y = util.ball_physics(pos.y, vel.y, bounds_y)
 
-        self.shadow.vpos = Vector2(self.vpos)
+        self.shadow.vpos.x = pos.x
+        self.shadow.vpos.y = pos.y
 
-        for target in game.players:
+        for target in game.grid.radius(self.vpos, constant.DRIBBLE_DIST_X):
 
             if (not self.owner or self.owner.team != target.team) and self.collide(target):
                 if self.owner:
 
                     self.owner.timer = 60
 
-                self.timer = game.difficulty.holdoff_timer
+                self.timer = game.teams[target.team].difficulty.holdoff_timer
 
                 game.teams[target.team].active_control_player = self.owner = target
 
@@ -63,11 +86,15 @@ class Ball(MyActor):
             team = game.teams[self.owner.team]
 
 
-            targetable_players = [p for p in game.players + game.goals if p.team == self.owner.team and game.targetable(p, self.owner)]
+            geometry = game.geometry()
+            candidates = [p for p in game.players + game.goals if p.team == self.owner.team]
+            mask = geometry.targetable(candidates, self.owner, not team.human())
+            targetable_players = [p for p, ok in zip(candidates, mask) if ok]
 
             if len(targetable_players) > 0:
 
-                target = min(targetable_players, key=game.dist_key(self.owner.vpos))
+                owner_dist = geometry.distances_from(self.owner)
+                target = min(targetable_players, key=lambda p: owner_dist[geometry.index[p]])
                 game.debug_shoot_target = target.vpos
             else:
                 target = None
@@ -76,7 +103,12 @@ class Ball(MyActor):
                 do_shoot = team.controls.shoot()
             else:
 
-                do_shoot = self.timer <= 0 and target and game.cost(target.vpos, self.owner.team) < game.cost(self.owner.vpos, self.owner.team)
+                do_shoot = False
+                if self.timer <= 0 and target:
+                    opponents = game.opponent_positions(self.owner.team)
+                    target_cost = game.cost(target.vpos.x, target.vpos.y, self.owner.team, opponents)
+                    own_cost = game.cost(self.owner.vpos.x, self.owner.vpos.y, self.owner.team, opponents)
+                    do_shoot = target_cost < own_cost
 
             if do_shoot:
 
@@ -84,28 +116,28 @@ class Ball(MyActor):
 
                 if target:
            
-                    r = 0
-
-                    iterations = 8 if team.human() and isinstance(target, Player) else 1
-
-                    for i in range(iterations):
-                        t = target.vpos + game.angle_to_vec(self.owner.dir) * r
+                    if team.human() and isinstance(target, Player):
 
-                        vec, length = game.safe_normalise(t - self.vpos)
+                        r = constant.HUMAN_PLAYER_WITHOUT_BALL_SPEED * kinematics.lead_frames(
+                            self.vpos, target.vpos, util.angle_to_vec(self.owner.dir), constant.HUMAN_PLAYER_WITHOUT_BALL_SPEED)
+                    else:
+                        r = 0
 
-                        r = constant.HUMAN_PLAYER_WITHOUT_BALL_SPEED * game.steps(length)
+                    dx, dy = util.DIRECTIONS[self.owner.dir]
+                    vx, vy, length = util.normalise(target.vpos.x + dx * r - pos.x, target.vpos.y + dy * r - pos.y)
                 else:
 
-                    vec = game.ngle_to_vec(self.owner.dir)
+                    vx, vy = util.DIRECTIONS[self.owner.dir]
 
-                    target = min([p for p in game.players if p.team == self.owner.team],
-                                 key=game.dist_key(self.vpos + (vec * 250)))
+                    target = game.grid.nearest(self.vpos + (util.angle_to_vec(self.owner.dir) * 250),
+                                               where=lambda p: p.team == self.owner.team)[0]
 
                 if isinstance(target, Player):
                     game.teams[self.owner.team].active_control_player = target
 
                 self.owner.timer = 10  
 
-                self.vel = vec * constant.KICK_STRENGTH
+                vel.x = vx * constant.KICK_STRENGTH
+                vel.y = vy * constant.KICK_STRENGTH
 
                 self.owner = None
\ No newline at end of file
@@ -0,0 +1,135 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from game import Game
+
+
+def run_match(job):
+    # Play one full CPU-vs-CPU match and return its record. The seed depends only on the match
+    # index, so a match replays identically whichever worker picks it up.
+    index, seed, difficulty, max_ticks = job
+
+    game = Game(None, None, difficulty, seed=seed)
+
+    ticks = 0
+    possession = []
+    possession_ticks = [0, 0]
+    goals = []
+    owner_team = None
+
+    while not game.game_over() and (max_ticks is None or ticks < max_ticks):
+        scores = [team.score for team in game.teams]
+
+        game.update()
+        ticks += 1
+
+        if game.ball.owner:
+            possession_ticks[game.ball.owner.team] += 1
+            if game.ball.owner.team != owner_team:
+                owner_team = game.ball.owner.team
+                possession.append((ticks, owner_team))
+
+        for team_num in range(2):
+            if game.teams[team_num].score != scores[team_num]:
+                goals.append((ticks, team_num))
+
+    return {
+        "index": index,
+        "seed": seed,
+        "difficulty": difficulty,
+        "max_ticks": max_ticks,
+        "score": [team.score for team in game.teams],
+        "ticks": ticks,
+        "finished": game.game_over(),
+        "possession_ticks": possession_ticks,
+        "possession": possession,
+        "goals": goals,
+    }
+
+
+def load_journal(path):
+    # Records already written by an earlier run, keyed by match index. A crash can leave a
+    # half-written last line, which is dropped so that match is simulated again.
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                done[record["index"]] = record
+    return done
+
+
+def run_batch(num_matches, path, difficulty=2, seed=0, processes=None, max_ticks=None):
+    # Run num_matches matches over a process pool, appending each record to path (JSON lines) as
+    # soon as it finishes. Matches already present in path are skipped, so an interrupted batch
+    # can be resumed by running the same command again. A record played with a different seed,
+    # difficulty or max_ticks isn't the match this run asks for, so it's dropped from the journal
+    # and played again. Returns all records, ordered by index.
+    records = load_journal(path)
+    stale = [index for index, record in records.items()
+             if (record["seed"], record["difficulty"], record.get("max_ticks")) != (seed + index, difficulty, max_ticks)]
+    for index in stale:
+        del records[index]
+
+    jobs = [(index, seed + index, difficulty, max_ticks)
+            for index in range(num_matches) if index not in records]
+
+    if jobs or stale:
+        # Rewrite the journal without any partial trailing line or stale records before appending
+        # to it
+        with open(path, "w") as f:
+            for index in sorted(records):
+                f.write(json.dumps(records[index]) + "\n")
+
+        with open(path, "a") as f, multiprocessing.Pool(processes) as pool:
+            for record in pool.imap_unordered(run_match, jobs):
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                records[record["index"]] = record
+
+    return [records[index] for index in range(num_matches)]
+
+
+def summarise(records):
+    wins = [0, 0]
+    for record in records:
+        if record["finished"]:
+            wins[int(record["score"][1] > record["score"][0])] += 1
+
+    total_ticks = sum(record["ticks"] for record in records)
+    possession = [sum(record["possession_ticks"][t] for record in records) for t in range(2)]
+    owned = sum(possession)
+
+    return {
+        "matches": len(records),
+        "unfinished": sum(1 for record in records if not record["finished"]),
+        "wins": wins,
+        "mean_ticks": total_ticks / len(records) if records else 0,
+        "mean_goals": sum(sum(record["score"]) for record in records) / len(records) if records else 0,
+        "possession_share": [p / owned if owned else 0 for p in possession],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run CPU-vs-CPU matches in parallel")
+    parser.add_argument("-n", "--matches", type=int, default=100)
+    parser.add_argument("-o", "--output", default="matches.jsonl")
+    parser.add_argument("-d", "--difficulty", type=int, default=2, choices=range(3))
+    parser.add_argument("-j", "--processes", type=int, default=None, help="default: one per core")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ticks", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records = run_batch(args.matches, args.output, args.difficulty, args.seed, args.processes, args.max_ticks)
+    elapsed = time.perf_counter() - start
+
+    summary = summarise(records)
+    summary["seconds"] = round(elapsed, 2)
+    print(json.dumps(summary, indent=2))
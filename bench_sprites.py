@@ -0,0 +1,65 @@
+# Compares the cost of drawing 14 players plus their shadows each frame the old way - building an
+# image name per sprite and assigning it to a Pygame Zero Actor, which looks the image up and
+# recalculates the anchor - with the pre-anchored SpriteTable the renderer now uses.
+# Draws offscreen, so no window is needed: python bench_sprites.py [frames]
+import os
+import sys
+import timeit
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import pgzero.game
+import pgzero.loaders
+import pgzero.screen
+from pgzero.actor import Actor
+
+import constant
+from game import Game
+from player import Player
+from render import Renderer
+
+
+def old_draw(game, actors, shadows):
+    for p, actor, shadow in zip(game.players, actors, shadows):
+        suffix = str(p.dir) + str((int(p.anim_frame) // 18) + 1)
+        actor.image = "player" + str(p.team) + suffix
+        shadow.image = "players" + suffix
+        actor.pos = shadow.pos = (p.vpos.x, p.vpos.y)
+        actor.draw()
+        shadow.draw()
+
+
+def new_draw(game, renderer):
+    for p in game.players:
+        renderer.draw_player(p, 0, 0)
+        renderer.draw_player(p, 0, 0, shadow=True)
+
+
+if __name__ == "__main__":
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    pygame.init()
+    pygame.display.set_mode((constant.WIDTH, constant.HEIGHT))
+    pgzero.loaders.set_root(os.path.dirname(os.path.abspath(__file__)))
+    screen = pgzero.game.screen = pgzero.screen.Screen(pygame.Surface((constant.LEVEL_W, constant.LEVEL_H)))
+
+    game = Game()
+    renderer = Renderer(screen)
+    actors = [Actor("blank", anchor=Player.ANCHOR) for p in game.players]
+    shadows = [Actor("blank", anchor=Player.ANCHOR) for p in game.players]
+
+    def tick():
+        game.update()
+
+    # Advance the match between draws so directions and animation frames keep changing
+    old = timeit.timeit(lambda: (tick(), old_draw(game, actors, shadows)), number=frames)
+    new = timeit.timeit(lambda: (tick(), new_draw(game, renderer)), number=frames)
+    update = timeit.timeit(tick, number=frames)
+
+    old_us = (old - update) / frames * 1e6
+    new_us = (new - update) / frames * 1e6
+    print("{0} players + shadows, {1} frames".format(len(game.players), frames))
+    print("image names + Actor.image: {0:8.1f} us/frame".format(old_us))
+    print("SpriteTable:               {0:8.1f} us/frame".format(new_us))
+    print("saving:                    {0:8.1f} us/frame ({1:.0%})".format(old_us - new_us, 1 - new_us / old_us))
@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pygame
+from pygame.math import Vector2
+
+from game import Game
+from replay import ReplayControls
+import controls
+import kinematics
+import util
+
+# Microbenchmarks of the simulation's hot paths, for each combination of difficulty and team size
+# asked for. Each benchmark starts from a game state found by playing a seeded match until the
+# situation it needs comes up, so runs are repeatable. Results are written as JSON:
+#   python benchmark.py -d 0 2 -t 5 7 -o results.json
+#   python benchmark.py --compare before.json after.json
+#   python benchmark.py --scaling
+
+SEED = 1
+MAX_SEARCH_TICKS = 20000
+
+# Team sizes for --scaling, and the number of ticks of each match played
+SCALING_TEAM_SIZES = [7, 11, 22, 50]
+SCALING_TICKS = 3000
+
+
+def branch(p):
+    # Which branch of Player.update player p would take in the current state
+    game = p.game
+    team = game.teams[p.team]
+    ball = game.ball
+    pre_kickoff = game.kickoff_player is not None
+
+    if p == team.active_control_player and team.human() and (not pre_kickoff or p == game.kickoff_player):
+        return "human"
+    elif ball.owner is not None:
+        if ball.owner == p:
+            return "owner"
+        elif ball.owner.team == p.team:
+            return "support" if p.active() else "home"
+        elif p.lead is not None:
+            return "lead"
+        elif p.mark.active():
+            return "marker"
+        return "home"
+    elif (pre_kickoff and p == game.kickoff_player) or (not pre_kickoff and p.active()):
+        return "interceptor"
+    return "home"
+
+
+def find(game, predicate):
+    # Play game on until predicate(game) returns something other than None, and return it along
+    # with a snapshot of that state
+    for tick in range(MAX_SEARCH_TICKS):
+        found = predicate(game)
+        if found is not None:
+            return found, game.snapshot()
+        game.update()
+    raise RuntimeError("Situation not found")
+
+
+def find_player(game, name):
+    return find(game, lambda game: next((p for p in game.players if branch(p) == name), None))
+
+
+def measure(func, setup=None, number=200, repeat=7):
+    # Time number calls of func, repeat times, calling setup (untimed) before each run. Returns the
+    # best and median time per call in microseconds.
+    times = []
+    for i in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for j in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number * 1e6)
+    return {"best_us": min(times), "median_us": statistics.median(times), "calls": number * repeat}
+
+
+def benchmarks(difficulty, team_size, draw=True):
+    results = {}
+
+    game = Game(None, None, difficulty, seed=SEED, team_size=team_size)
+    restore = lambda state: lambda: game.restore(state)
+
+    # Stateless helpers
+    vec = Vector2(3, -4)
+    results["vec_to_angle"] = measure(lambda: util.vec_to_angle(vec), number=5000)
+    results["angle_to_vec"] = measure(lambda: util.angle_to_vec(3), number=5000)
+    results["octant"] = measure(lambda: util.octant(3.0, -4.0), number=5000)
+    results["normalise"] = measure(lambda: util.normalise(3.0, -4.0), number=5000)
+    results["ball_physics"] = measure(lambda: util.ball_physics(500.0, 7.5, (50, 950)), number=5000)
+    results["frames_to_distance"] = measure(lambda: kinematics.frames_to_distance(250.5), number=5000)
+    results["lead_frames"] = measure(lambda: kinematics.lead_frames(Vector2(500, 700), Vector2(600, 500),
+                                                                  Vector2(0, -1), 4), number=2000)
+
+    # The CPU player with the ball scoring its five candidate moves, the shoot decision, and
+    # checking whether a pass is possible
+    owner, state = find(game, lambda game: game.ball.owner)
+    candidates = [owner.vpos + util.angle_to_vec(owner.dir + d) * 3 for d in range(-2, 3)]
+    results["cost_5"] = measure(lambda: game.costs(candidates, owner.team), restore(state), number=1000)
+    results["cost_2"] = measure(lambda: game.costs(candidates[:2], owner.team), restore(state), number=1000)
+
+    def scalar_costs():
+        opponents = game.opponent_positions(owner.team)
+        for pos in candidates:
+            game.cost(pos.x, pos.y, owner.team, opponents)
+    results["cost_5_scalar"] = measure(scalar_costs, restore(state), number=1000)
+
+    def rebuild_geometry():
+        game.geometry_cache = None
+        game.geometry()
+    results["geometry"] = measure(rebuild_geometry, restore(state), number=1000)
+    teammate = next(p for p in game.players if p.team == owner.team and p != owner)
+    results["targetable"] = measure(lambda: game.targetable(teammate, owner), restore(state), number=1000)
+
+    # Player.update in each of its branches, from a state where some player takes it. Repeated
+    # calls move that player along, so the state is restored before each run.
+    for name in ("owner", "lead", "marker", "interceptor"):
+        game.restore(state)
+        p, branch_state = find_player(game, name)
+        results["player_" + name] = measure(p.update, restore(branch_state), number=50)
+
+    human_controls = ReplayControls(False)
+    human_controls.input = controls.UP | controls.LEFT
+    human_game = Game(human_controls, None, difficulty, seed=SEED, team_size=team_size)
+    p, branch_state = find_player(human_game, "human")
+    results["player_human"] = measure(p.update, lambda: human_game.restore(branch_state), number=50)
+
+    # Ball.update with the ball owned and free
+    game.restore(state)
+    results["ball_owned"] = measure(game.ball.update, restore(state), number=50)
+    moving_ball = lambda game: game.ball if game.ball.owner is None and game.ball.vel.length() > 1 else None
+    ball, free_state = find(game, moving_ball)
+    results["ball_free"] = measure(ball.update, restore(free_state), number=50)
+
+    # Whole ticks of the match, from kickoff
+    kickoff = Game(None, None, difficulty, seed=SEED, team_size=team_size).snapshot()
+    results["game_update"] = measure(game.update, restore(kickoff), number=500, repeat=5)
+
+    if draw:
+        results["game_draw"] = measure_draw(game, kickoff)
+
+    return results
+
+
+def measure_draw(game, state):
+    # Render the game to an offscreen surface with the same Renderer the front end uses
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import constant
+    import pgzero.loaders
+    import pgzero.screen
+    from render import Renderer
+
+    pygame.init()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((constant.WIDTH, constant.HEIGHT))
+    pgzero.loaders.set_root(os.path.dirname(os.path.abspath(__file__)))
+    screen = pgzero.screen.Screen(pygame.Surface((constant.WIDTH, constant.HEIGHT)))
+    renderer = Renderer(screen)
+
+    game.restore(state)
+    for i in range(100):
+        game.update()
+    return measure(lambda: renderer.draw(game), number=100, repeat=5)
+
+
+def scaling(difficulty, team_sizes, ticks=SCALING_TICKS):
+    # Time per tick of the same seeded match played with each team size, from kickoff. The
+    # exponent is the slope of log(time) against log(players), from a least squares fit - 1 for
+    # cost that grows linearly with the number of players, 2 for quadratic.
+    results = []
+    for team_size in team_sizes:
+        game = Game(None, None, difficulty, seed=SEED, team_size=team_size)
+        kickoff = game.snapshot()
+        timing = measure(game.update, lambda: game.restore(kickoff), number=ticks, repeat=3)
+        timing["us_per_player"] = timing["best_us"] / (team_size * 2)
+        results.append(dict(team_size=team_size, **timing))
+
+    players = np.log([r["team_size"] * 2 for r in results])
+    times = np.log([r["best_us"] for r in results])
+    exponent = float(np.polyfit(players, times, 1)[0]) if len(results) > 1 else None
+    return {"difficulty": difficulty, "ticks": ticks, "exponent": exponent, "results": results}
+
+
+def run(difficulties, team_sizes, draw=True):
+    results = []
+    for difficulty in difficulties:
+        for team_size in team_sizes:
+            for name, timing in benchmarks(difficulty, team_size, draw).items():
+                results.append(dict(name=name, difficulty=difficulty, team_size=team_size, **timing))
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "results": results,
+    }
+
+
+def compare(before, after):
+    # Best time of each benchmark in after as a ratio of the same benchmark in before - the best of
+    # several runs is the least affected by whatever else the machine was doing
+    key = lambda r: (r["name"], r["difficulty"], r["team_size"])
+    old = {key(r): r for r in before["results"]}
+    for r in after["results"]:
+        if key(r) in old:
+            ratio = r["best_us"] / old[key(r)]["best_us"]
+            print("{0:<20} d{1} t{2:<3} {3:10.2f} -> {4:10.2f} us  x{5:.2f}".format(
+                r["name"], r["difficulty"], r["team_size"], old[key(r)]["best_us"], r["best_us"], ratio))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the simulation's hot paths")
+    parser.add_argument("-d", "--difficulty", type=int, nargs="+", default=[2], choices=range(3))
+    parser.add_argument("-t", "--team-size", type=int, nargs="+", default=[7])
+    parser.add_argument("-o", "--output", help="write results to this JSON file (default: standard output)")
+    parser.add_argument("--no-draw", action="store_true", help="skip the rendering benchmark")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    parser.add_argument("--scaling", action="store_true",
+                        help="time whole ticks at {0} a side and fit how cost grows with players".format(
+                            ", ".join(map(str, SCALING_TEAM_SIZES))))
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            compare(json.load(f), json.load(g))
+        sys.exit()
+
+    if args.scaling:
+        reports = []
+        for difficulty in args.difficulty:
+            report = scaling(difficulty, SCALING_TEAM_SIZES)
+            for r in report["results"]:
+                print("d{0} t{1:<3} {2:10.2f} us/tick {3:8.2f} us/player".format(
+                    difficulty, r["team_size"], r["best_us"], r["us_per_player"]))
+            print("d{0} cost grows as players ^ {1:.2f}".format(difficulty, report["exponent"]))
+            reports.append(report)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(reports, f, indent=1)
+        sys.exit()
+
+    report = run(args.difficulty, args.team_size, not args.no_draw)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+        for r in report["results"]:
+            print("{0:<20} d{1} t{2:<3} {3:10.2f} us".format(r["name"], r["difficulty"], r["team_size"], r["median_us"]))
+    else:
+        print(json.dumps(report, indent=1))
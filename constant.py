@@ -1,6 +1,3 @@
-import math
-import pygame
-
 WIDTH = 800
 HEIGHT = 480
 TITLE = "Soccer"
@@ -19,24 +16,12 @@ GOAL_WIDTH = 186
 GOAL_DEPTH = 20
 HALF_GOAL_W = GOAL_WIDTH // 2
 
-PITCH_BOUNDS_X = (HALF_LEVEL_W - HALF_PITCH_W, HALF_LEVEL_W + HALF_PITCH_W)
-PITCH_BOUNDS_Y = (HALF_LEVEL_H - HALF_PITCH_H, HALF_LEVEL_H + HALF_PITCH_H)
-
-GOAL_BOUNDS_X = (HALF_LEVEL_W - HALF_GOAL_W, HALF_LEVEL_W + HALF_GOAL_W)
-GOAL_BOUNDS_Y = (HALF_LEVEL_H - HALF_PITCH_H - GOAL_DEPTH,
-                 HALF_LEVEL_H + HALF_PITCH_H + GOAL_DEPTH)
-
-PITCH_RECT = pygame.rect.Rect(PITCH_BOUNDS_X[0], PITCH_BOUNDS_Y[0], HALF_PITCH_W * 2, HALF_PITCH_H * 2)
-GOAL_0_RECT = pygame.rect.Rect(GOAL_BOUNDS_X[0], GOAL_BOUNDS_Y[0], GOAL_WIDTH, GOAL_DEPTH)
-GOAL_1_RECT = pygame.rect.Rect(GOAL_BOUNDS_X[0], GOAL_BOUNDS_Y[1] - GOAL_DEPTH, GOAL_WIDTH, GOAL_DEPTH)
-
 AI_MIN_X = 78
-AI_MAX_X = LEVEL_W - 78
-AI_MIN_Y = 98
-AI_MAX_Y = LEVEL_H - 98
 
 PLAYER_START_POS = [(350, 550), (650, 450), (200, 850), (500, 750), (800, 950), (350, 1250), (650, 1150)]
 
+GRID_CELL_SIZE = 200
+
 LEAD_DISTANCE_1 = 10
 LEAD_DISTANCE_2 = 50
 
@@ -56,4 +41,6 @@ DEBUG_SHOW_SHOOT_TARGET = False
 DEBUG_SHOW_COSTS = False
 
 KICK_STRENGTH = 11.5
-DRAG = 0.98
\ No newline at end of file
+DRAG = 0.98
+
+WINNING_SCORE = 9
\ No newline at end of file
@@ -1,5 +1,24 @@
-import game
 from pygame.math import Vector2
+from pgzero.builtins import keyboard, keys
+
+key_status = {}
+
+# Bits of the input state returned by Controls.state
+UP, DOWN, LEFT, RIGHT, SHOOT = 1, 2, 4, 8, 16
+
+def key_just_pressed(key):
+    result = False
+
+
+    prev_status = key_status.get(key, False)
+
+    if not prev_status and keyboard[key]:
+        result = True
+
+
+    key_status[key] = keyboard[key]
+
+    return result
 
 class Controls:
     def __init__(self, player_num):
@@ -16,6 +35,16 @@ class Controls:
             self.key_right = keys.D
             self.key_shoot = keys.LSHIFT
 
+    def state(self):
+        # Which of this player's keys are held this frame, as a combination of the bits above
+        return (UP * keyboard[self.key_up] | DOWN * keyboard[self.key_down] | LEFT * keyboard[self.key_left]
+                | RIGHT * keyboard[self.key_right] | SHOOT * keyboard[self.key_shoot])
+
+    def shoot_held(self):
+        # Whether the shoot key was down the last time shoot() (or anything else checking it with
+        # key_just_pressed) looked at it, which decides whether the next press counts
+        return key_status.get(self.key_shoot, False)
+
     def move(self, speed):
         dx, dy = 0, 0
         if keyboard[self.key_left]:
@@ -29,4 +58,4 @@ class Controls:
         return Vector2(dx, dy) * speed
 
     def shoot(self):
-        return game.key_just_pressed(self.key_shoot)
\ No newline at end of file
+        return key_just_pressed(self.key_shoot)
@@ -0,0 +1,64 @@
+import math
+import numpy as np
+from pitch import STANDARD
+
+# Weights of the three terms: distance from the goal being defended, closeness to each opponent, and
+# the divisor of the penalty for being out wide
+WEIGHTS = (3500, 4000, 200)
+
+def costs(positions, opponents, team, handicap=0, pitch=STANDARD, weights=WEIGHTS):
+    # Vectorised form of the AI's cost function. Scores every row of positions (an M x 2 array of
+    # candidate points) for the given team against every row of opponents (N x 2), in one call.
+    # Lower is better: being near your own goal, near opponents or out wide all cost more, while
+    # progress up the pitch is rewarded. handicap may be a scalar or one value per candidate.
+    # Goal and centre line positions come from pitch, and the terms are weighted by weights.
+    # The arithmetic is done in the same order as the original scalar version, including summing
+    # the opponent terms one at a time (cumsum rather than sum, which uses pairwise summation),
+    # so the results match it exactly.
+    positions = np.asarray(positions, dtype=float)
+    opponents = np.asarray(opponents, dtype=float).reshape(-1, 2)
+    goal_weight, near_weight, wide_divisor = weights
+    x = positions[:, 0]
+    y = positions[:, 1]
+
+    goal_dx = x - pitch.half_level_w
+    goal_dy = y - pitch.goal_line(1 - team)
+    result = goal_weight / np.sqrt(goal_dx * goal_dx + goal_dy * goal_dy)
+
+    if len(opponents) > 0:
+        dx = opponents[:, 0] - x[:, np.newaxis]
+        dy = opponents[:, 1] - y[:, np.newaxis]
+        near = near_weight / np.maximum(24, np.sqrt(dx * dx + dy * dy))
+        result = result + np.cumsum(near, axis=1)[:, -1]
+
+    # Python's float ** 2 goes through the C library's pow(), which doesn't always round the same
+    # way as NumPy's x * x. This term is only O(M), so it's done per candidate to keep exact parity.
+    centre = pitch.half_level_w
+    wide = np.array([(px - centre)**2 for px in x.tolist()])
+    result = result + (wide / wide_divisor - y * (4 * team - 2))
+
+    return result + handicap
+
+
+def cost(x, y, opponents, team, handicap=0, pitch=STANDARD, weights=WEIGHTS):
+    # costs() for the single position (x, y), on plain floats, with opponents a sequence of (x, y)
+    # pairs. For the handful of candidates a tick scores, NumPy's overhead on such small arrays
+    # outweighs the arithmetic. The same operations are done in the same order, so the result is
+    # the same as costs() gives.
+    goal_weight, near_weight, wide_divisor = weights
+
+    goal_dx = x - pitch.half_level_w
+    goal_dy = y - pitch.goal_line(1 - team)
+    result = goal_weight / math.sqrt(goal_dx * goal_dx + goal_dy * goal_dy)
+
+    near = 0
+    for ox, oy in opponents:
+        dx = ox - x
+        dy = oy - y
+        near += near_weight / max(24, math.sqrt(dx * dx + dy * dy))
+    result = result + near
+
+    wide = (x - pitch.half_level_w)**2
+    result = result + (wide / wide_divisor - y * (4 * team - 2))
+
+    return result + handicap
@@ -1,5 +1,14 @@
+from cost import WEIGHTS
+import constant
+
 class Difficulty:
-    def __init__(self, goalie_enabled, second_lead_enabled, speed_boost, holdoff_timer):
+    # How a CPU team plays. cost_weights are the weights of the AI's cost function - see cost.py.
+    # The speeds are those its players move at when not under human control: by default, when
+    # running onto a loose ball, with the ball (before speed_boost is added) and closing down the
+    # player with the ball.
+    def __init__(self, goalie_enabled, second_lead_enabled, speed_boost, holdoff_timer, cost_weights=WEIGHTS,
+                 default_speed=constant.PLAYER_DEFAULT_SPEED, intercept_speed=constant.PLAYER_INTERCEPT_BALL_SPEED,
+                 with_ball_speed=constant.CPU_PLAYER_WITH_BALL_BASE_SPEED, lead_speed=constant.LEAD_PLAYER_BASE_SPEED):
         self.goalie_enabled = goalie_enabled
 
         self.second_lead_enabled = second_lead_enabled
@@ -7,3 +16,10 @@ class Difficulty:
         self.speed_boost = speed_boost
 
         self.holdoff_timer = holdoff_timer
+
+        self.cost_weights = tuple(cost_weights)
+
+        self.default_speed = default_speed
+        self.intercept_speed = intercept_speed
+        self.with_ball_speed = with_ball_speed
+        self.lead_speed = lead_speed
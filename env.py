@@ -0,0 +1,261 @@
+import argparse
+import multiprocessing
+import random
+import time
+from multiprocessing.sharedctypes import RawArray
+
+import numpy as np
+
+from controls import UP, DOWN, LEFT, RIGHT, SHOOT
+from game import Game
+from replay import ReplayControls
+import constant
+import util
+
+# Reinforcement learning environments. Each agent controls one team the way a human player would,
+# through the input bits of Controls.state(), chosen by an action number:
+#   0       no movement        1-8     move up, up-right, right, ... up-left, clockwise
+#   9-17    the same, with the shoot button held - it kicks on the first tick it's held, like a
+#           key press, so holding it does nothing more
+# Directions are from the agent's end, as its observations are: team 1's are turned through 180
+# degrees, so move a (1-8) becomes move (a - 1 + 4) % 8 + 1 on the pitch, and up always attacks.
+MOVES = [0, UP, UP | RIGHT, RIGHT, DOWN | RIGHT, DOWN, DOWN | LEFT, LEFT, UP | LEFT]
+ACTIONS = MOVES + [move | SHOOT for move in MOVES]
+NUM_ACTIONS = len(ACTIONS)
+
+# The input bits for each action, by team
+TURNED_MOVES = [0] + [MOVES[(a - 1 + 4) % 8 + 1] for a in range(1, 9)]
+TEAM_ACTIONS = [ACTIONS, TURNED_MOVES + [move | SHOOT for move in TURNED_MOVES]]
+
+
+def observation_size(team_size):
+    # Ball position and velocity, which team has it, the position and facing of the player the
+    # agent controls, then the position of every player on the agent's team and on the other
+    return 4 + 2 + 4 + team_size * 4
+
+
+class SoccerEnv:
+    # A match as an environment with the usual reset/step interface, for one or two agents. teams
+    # lists the teams the agents play for, in the order their actions and observations come in;
+    # any other team is played by the CPU. Each step applies every agent's action for frame_skip
+    # ticks. An episode ends when the match is won (terminated) or after max_ticks ticks (truncated).
+    # Observations are float32 arrays of observation_size(team_size), seen from the agent's end:
+    # positions are relative to the centre spot, in units of half the pitch's width and height,
+    # and for team 1 turned through 180 degrees, so every agent attacks towards negative y. Team 1's
+    # actions are turned the same way.
+    # The reward is +1 for each goal the agent's team scores and -1 for each it concedes.
+    def __init__(self, teams=(0,), difficulty=2, team_size=None, frame_skip=1, max_ticks=None):
+        self.agent_teams = list(teams)
+        self.difficulty = difficulty
+        self.team_size = team_size or len(constant.PLAYER_START_POS)
+        self.frame_skip = frame_skip
+        self.max_ticks = max_ticks
+        self.observation_size = observation_size(self.team_size)
+        self.num_actions = NUM_ACTIONS
+        self.action_tables = [TEAM_ACTIONS[t] for t in self.agent_teams]
+        self.game = None
+
+    def reset(self, seed=None):
+        controls = [None, None]
+        for t in self.agent_teams:
+            controls[t] = ReplayControls(False)
+        self.controls = [controls[t] for t in self.agent_teams]
+        self.game = Game(controls[0], controls[1], self.difficulty, seed=seed, team_size=self.team_size)
+        self.ticks = 0
+
+        pitch = self.game.pitch
+        self.centre = (pitch.half_level_w, pitch.half_level_h)
+        self.scale = (1 / pitch.half_pitch_w, 1 / pitch.half_pitch_h)
+
+        return self.observe()
+
+    def step(self, actions):
+        # Returns observations, rewards, terminated, truncated, info - the first two with a row
+        # per agent
+        rewards, terminated, truncated = self.advance(actions)
+        return self.observe(), rewards, terminated, truncated, {"score": [team.score for team in self.game.teams]}
+
+    def advance(self, actions):
+        # step() without building the observations
+        game = self.game
+        for controls, table, action in zip(self.controls, self.action_tables, actions):
+            controls.input = table[action]
+
+        scores = [team.score for team in game.teams]
+        terminated = False
+        for i in range(self.frame_skip):
+            game.update()
+            self.ticks += 1
+            if game.game_over():
+                terminated = True
+                break
+
+        goals = [team.score - score for team, score in zip(game.teams, scores)]
+        rewards = np.array([goals[t] - goals[1 - t] for t in self.agent_teams], dtype=np.float32)
+        truncated = not terminated and self.max_ticks is not None and self.ticks >= self.max_ticks
+        return rewards, terminated, truncated
+
+    def observe(self, out=None):
+        # Observations for every agent, written into out (agents x observation_size) if given
+        game = self.game
+        ball = game.ball
+        cx, cy = self.centre
+        sx, sy = self.scale
+        vel_scale = 1 / constant.KICK_STRENGTH
+
+        players = [(p.team, (p.vpos.x - cx) * sx, (p.vpos.y - cy) * sy) for p in game.players]
+        owner_team = ball.owner.team if ball.owner else -1
+
+        if out is None:
+            out = np.empty((len(self.agent_teams), self.observation_size), dtype=np.float32)
+
+        for row, t in zip(out, self.agent_teams):
+            # Team 1 sees the pitch turned round
+            flip = 1 if t == 0 else -1
+            active = game.teams[t].active_control_player
+            facing = (active.dir + (0 if t == 0 else 4)) % 8
+
+            values = [(ball.vpos.x - cx) * sx * flip, (ball.vpos.y - cy) * sy * flip,
+                      ball.vel.x * vel_scale * flip, ball.vel.y * vel_scale * flip,
+                      owner_team == t, owner_team == 1 - t,
+                      (active.vpos.x - cx) * sx * flip, (active.vpos.y - cy) * sy * flip,
+                      util.DIRECTIONS[facing][0], util.DIRECTIONS[facing][1]]
+            for team in (t, 1 - t):
+                for p_team, x, y in players:
+                    if p_team == team:
+                        values.append(x * flip)
+                        values.append(y * flip)
+            row[:] = values
+
+        return out
+
+
+def worker(connection, first, count, options, buffers):
+    # Runs envs first to first + count - 1 of a VectorEnv, in their own process. Commands come
+    # through connection; actions are read from, and results written to, the shared buffers.
+    obs, actions, rewards, dones, scores = [np.frombuffer(buffer, dtype).reshape(shape)
+                                            for buffer, dtype, shape in buffers]
+    envs = [SoccerEnv(**options) for i in range(count)]
+    seeds = [None] * count
+
+    while True:
+        command, seed = connection.recv()
+        if command == "close":
+            break
+
+        for i, env in enumerate(envs):
+            n = first + i
+            if command == "reset":
+                # Each env's later episodes are seeded from a generator seeded for that env, so
+                # a run from the same seed is repeatable
+                seeds[i] = random.Random(None if seed is None else seed + n)
+                env.reset(seeds[i].getrandbits(64))
+                dones[n] = 0
+            else:
+                rewards[n], terminated, truncated = env.advance(actions[n])
+                dones[n] = 1 if terminated else 2 if truncated else 0
+                scores[n] = [team.score for team in env.game.teams]
+                if terminated or truncated:
+                    env.reset(seeds[i].getrandbits(64))
+            env.observe(obs[n])
+
+        connection.send(None)
+
+    connection.close()
+
+
+class VectorEnv:
+    # num_envs SoccerEnvs stepped together, split between num_workers processes (default: one
+    # per core). Observations, actions, rewards and episode ends pass through arrays in shared
+    # memory, so the only thing sent between processes each step is a short command and a reply.
+    # step() returns arrays with a leading axis of num_envs. An env whose episode has ended is
+    # reset straight away: the observation returned for it is the first of its next episode, and
+    # info["score"] holds the final score of the one that ended.
+    def __init__(self, num_envs, num_workers=None, **options):
+        self.num_envs = num_envs
+        probe = SoccerEnv(**options)
+        self.num_agents = len(probe.agent_teams)
+        self.observation_size = probe.observation_size
+        self.num_actions = probe.num_actions
+
+        layout = [(np.float32, (num_envs, self.num_agents, self.observation_size)),
+                  (np.int64, (num_envs, self.num_agents)),
+                  (np.float32, (num_envs, self.num_agents)),
+                  (np.uint8, (num_envs,)),
+                  (np.int64, (num_envs, 2))]
+        buffers = [(RawArray("b", int(np.prod(shape)) * np.dtype(dtype).itemsize), dtype, shape)
+                   for dtype, shape in layout]
+        self.obs, self.actions, self.rewards, self.dones, self.scores = \
+            [np.frombuffer(buffer, dtype).reshape(shape) for buffer, dtype, shape in buffers]
+
+        num_workers = min(num_envs, num_workers or multiprocessing.cpu_count())
+        bounds = [int(b) for b in np.linspace(0, num_envs, num_workers + 1)]
+        self.connections = []
+        self.processes = []
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=worker, args=(child, first, last - first, options, buffers),
+                                              daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+    def command(self, command, seed=None):
+        for connection in self.connections:
+            connection.send((command, seed))
+        for connection in self.connections:
+            connection.recv()
+
+    def reset(self, seed=None):
+        # Env i's first episode is seeded from seed + i
+        self.command("reset", seed)
+        return self.obs.copy()
+
+    def step(self, actions):
+        self.actions[:] = np.asarray(actions).reshape(self.actions.shape)
+        self.command("step")
+        terminated = self.dones == 1
+        truncated = self.dones == 2
+        return self.obs.copy(), self.rewards.copy(), terminated, truncated, {"score": self.scores.copy()}
+
+    def close(self):
+        for connection in self.connections:
+            try:
+                connection.send(("close", None))
+            except OSError:
+                pass
+        for process in self.processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure environment steps per second with random actions")
+    parser.add_argument("-n", "--envs", type=int, default=8)
+    parser.add_argument("-j", "--workers", type=int, default=None, help="default: one per core")
+    parser.add_argument("-s", "--steps", type=int, default=2000, help="steps of the vector env")
+    parser.add_argument("--frame-skip", type=int, default=1)
+    parser.add_argument("--max-ticks", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    options = {"frame_skip": args.frame_skip, "max_ticks": args.max_ticks}
+
+    env = SoccerEnv(**options)
+    env.reset(0)
+    start = time.perf_counter()
+    for i in range(args.steps):
+        obs, rewards, terminated, truncated, info = env.step(rng.integers(NUM_ACTIONS, size=1))
+        if terminated or truncated:
+            env.reset()
+    elapsed = time.perf_counter() - start
+    print("1 env: {0:.0f} steps/s".format(args.steps / elapsed))
+
+    vec = VectorEnv(args.envs, args.workers, **options)
+    vec.reset(0)
+    start = time.perf_counter()
+    for i in range(args.steps):
+        vec.step(rng.integers(NUM_ACTIONS, size=(args.envs, 1)))
+    elapsed = time.perf_counter() - start
+    vec.close()
+    print("{0} envs in {1} workers: {2:.0f} steps/s".format(args.envs, len(vec.processes), args.steps * args.envs / elapsed))
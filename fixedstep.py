@@ -0,0 +1,41 @@
+MIN_SPEED = 0.25
+MAX_SPEED = 64
+
+class FixedStep:
+    # Runs a simulation at a fixed rate of ticks per second of game time, however often advance()
+    # is called. Real time passed to advance() is scaled by speed and added to an accumulator, and
+    # one tick is run for each whole tick's worth in it. What's left over is returned as alpha, the
+    # fraction of the way from the last tick to the next, for drawing between the two.
+    # A frame that took longer than max_dt seconds (say the window was being dragged) only counts
+    # as max_dt, and no more than max_ticks ticks are run per call. If the simulation can't keep up
+    # with the speed asked for, it falls behind rather than trying to catch up ever more ticks.
+    def __init__(self, rate=60, speed=1, max_dt=0.1, max_ticks=256):
+        self.rate = rate
+        self.step = 1 / rate
+        self.max_dt = max_dt
+        self.max_ticks = max_ticks
+        self.accumulator = 0
+        self.alpha = 0
+        self.set_speed(speed)
+
+    def set_speed(self, speed):
+        self.speed = max(MIN_SPEED, min(MAX_SPEED, speed))
+
+    def faster(self):
+        self.set_speed(self.speed * 2)
+
+    def slower(self):
+        self.set_speed(self.speed / 2)
+
+    def advance(self, dt, tick):
+        # Call tick() once for each tick due after dt more seconds of real time, and return alpha
+        self.accumulator += min(dt, self.max_dt) * self.speed
+
+        # Allowing for rounding error, so that say 144 frames of 1/144 seconds make exactly 60 ticks
+        ticks = min(int(self.accumulator * self.rate + 1e-6), self.max_ticks)
+        for i in range(ticks):
+            tick()
+
+        self.accumulator = max(0, min(self.accumulator - ticks * self.step, self.step))
+        self.alpha = self.accumulator * self.rate
+        return self.alpha
@@ -1,159 +1,96 @@
-import pgzero, pgzrun, pygame
-from enum import Enum
 from pygame.math import Vector2
+import bisect
 import random
-import sys
-import math
+import numpy as np
 
-# Import other game components
 from player import Player
 from ball import Ball
 from goal import Goal
 from team import Team
-from controls import Controls
-from state import State, MenuState
 from difficulty import Difficulty
-import constant 
-
-# Define constants for the game window size and title
-WIDTH = 800
-HEIGHT = 480
-TITLE = "Soccer"
-
-# Check the version of pgzero and exit if it's older than 1.2
-pgzero_version = [int(s) if s.isnumeric() else s for s in pgzero.__version__.split('.')]
-if pgzero_version < [1, 2]:
-    sys.exit()
+from spatial import SpatialGrid
+from geometry import Geometry
+from pitch import Pitch
+from timing import SCORE, LEADS, PLAYERS, BALL, SWITCHING, CAMERA
+import constant
+import cost
+import snapshot
+import util
 
 
 DIFFICULTY = [Difficulty(False, False, 0, 120), Difficulty(False, True, 0.1, 90), Difficulty(True, True, 0.2, 60)]
 
-def sin(x):
-    return math.sin(x*math.pi/4)
-
-def cos(x):
-    return sin(x+2)
-
-
-def vec_to_angle(vec):
-
-    return int(4 * math.atan2(vec.x, -vec.y) / math.pi + 8.5) % 8
-
-
-def angle_to_vec(angle):
-    return Vector2(sin(angle), -cos(angle))
-
-
-def dist_key(pos):
-    return lambda p: (p.vpos - pos).length()
-
-
-def safe_normalise(vec):
-    length = vec.length()
-    if length == 0:
-        return Vector2(0,0), 0
-    else:
-        return vec.normalize(), length
-
-def ball_physics(pos, vel, bounds):
-    pos += vel
-
-    if pos < bounds[0] or pos > bounds[1]:
-        pos, vel = pos - vel, -vel
-
-    return pos, vel * constant.DRAG
-
-def steps(distance):
-    steps, vel = 0, constant.KICK_STRENGTH
-
-    while distance > 0 and vel > 0.25:
-        distance, steps, vel = distance - vel, steps + 1, vel * constant.DRAG
-
-    return steps
-
-def targetable(target, source):
-    v0, d0 = safe_normalise(target.vpos - source.vpos)
-
-
-    if not game.teams[source.team].human():
-        for p in game.players:
-            v1, d1 = safe_normalise(p.vpos - source.vpos)
-            if p.team != target.team and d1 > 0 and d1 < d0 and v0*v1 > 0.8:
-                return False
-
-    return target.team == source.team and d0 > 0 and d0 < 300 and v0 * angle_to_vec(source.dir) > 0.8
-
-def avg(a, b):
-    return b if abs(b-a) < 1 else (a+b)/2
-
-def on_pitch(x, y):
-
-    return constant.PITCH_RECT.collidepoint(x,y) \
-           or constant.GOAL_0_RECT.collidepoint(x,y) \
-           or constant.GOAL_1_RECT.collidepoint(x,y)
-
-def allow_movement(x, y):
-    if abs(x - constant.HALF_LEVEL_W) > constant.HALF_LEVEL_W:
-        return False
-
-    elif abs(x - constant.HALF_LEVEL_W) < constant.HALF_GOAL_W + 20:
-        return abs(y - constant.HALF_LEVEL_H) < constant.HALF_PITCH_H
-
-    else:
-        return abs(y - constant.HALF_LEVEL_H) < constant.HALF_LEVEL_H
-
-
-def cost(pos, team, handicap=0):
-
-    own_goal_pos = Vector2(constant.HALF_LEVEL_W, 78 if team == 1 else constant.LEVEL_H - 78)
-    inverse_own_goal_distance = 3500 / (pos - own_goal_pos).length()
-
-    result = inverse_own_goal_distance \
-            + sum([4000 / max(24, (p.vpos - pos).length()) for p in game.players if p.team != team]) \
-            + ((pos.x - constant.HALF_LEVEL_W)**2 / 200 \
-            - pos.y * (4 * team - 2)) \
-            + handicap
-
-    return result, pos
-
 
+def team_difficulties(difficulty):
+    # The Difficulty of each team, from a level, a Difficulty, or a pair of either
+    pair = difficulty if isinstance(difficulty, (list, tuple)) else [difficulty] * 2
+    return [d if isinstance(d, Difficulty) else DIFFICULTY[d] for d in pair]
 
 
 class Game:
-    def __init__(self, p1_controls=None, p2_controls=None, difficulty=2):
-        self.teams = [Team(p1_controls), Team(p2_controls)]
-        self.difficulty = DIFFICULTY[difficulty]
-
-        try:
+    # The simulation core. Owns all match state and the per-tick logic, and has no dependency on
+    # Pygame Zero. Input comes through the Controls objects passed in (None means a CPU team), and
+    # audio is an optional adapter with play/loop/stop/play_music/fadeout_music methods. Rendering
+    # is done from the outside by reading the game state - see render.py.
+    # All randomness comes from generators seeded with seed (a random one if None), so the same
+    # seed and the same inputs always play out the same match. Sound variations are picked from a
+    # separate generator, so whether or not there's audio has no effect on the simulation. The
+    # simulation's generator is a NumPy PCG64, whose whole state is 32 bytes - see snapshot().
+    # difficulty is a level (an index into DIFFICULTY), a Difficulty, or a pair of either - one for
+    # each team, so CPU teams with different settings can play each other. difficulty_level is
+    # what was passed in, which only replays and netplay, where it's always a level, look at.
+    # team_size is the number of players a side, seven by default. Each size has its own formation
+    # and a pitch scaled to suit it (see pitch.py), unless pitch is given.
+    # timing, if given, is a timing.FrameTiming to record how long each phase of update() takes.
+    def __init__(self, p1_controls=None, p2_controls=None, difficulty=2, audio=None, seed=None,
+                 team_size=None, timing=None, pitch=None):
+        self.timing = timing
+        self.team_size = team_size or len(constant.PLAYER_START_POS)
+        self.pitch = pitch or Pitch.for_team_size(self.team_size)
+        self.start_positions = self.pitch.home_positions(self.team_size)
+        self.difficulty_level = difficulty
+        difficulties = team_difficulties(difficulty)
+        self.teams = [Team(p1_controls, difficulties[0]), Team(p2_controls, difficulties[1])]
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.random = np.random.Generator(np.random.PCG64(self.seed))
+        self.sound_random = random.Random(self.seed)
+        self.audio = audio
+
+        if self.audio:
             if self.teams[0].human():
-                music.fadeout(1)
-                sounds.crowd.play(-1)
-                sounds.start.play()
+                self.audio.fadeout_music(1)
+                self.audio.loop("crowd")
+                self.audio.play("start")
             else:
-                music.play("theme")
-                sounds.crowd.stop()
-        except Exception:
-            pass
+                self.audio.play_music("theme")
+                self.audio.stop("crowd")
 
         self.score_timer = 0
         self.scoring_team = 1   
 
+        self.grid = SpatialGrid(self.pitch.level_w, self.pitch.level_h, constant.GRID_CELL_SIZE)
+
         self.reset()
 
     def reset(self):
 
         self.players = []
-        random_offset = lambda x: x + random.randint(-32, 32)
-        for pos in constant.PLAYER_START_POS:
+        random_offset = lambda x: x + int(self.random.integers(-32, 33))
+        for pos in self.start_positions:
      
-            self.players.append(Player(random_offset(pos[0]), random_offset(pos[1]), 0))
-            self.players.append(Player(random_offset(constant.LEVEL_W - pos[0]), random_offset(constant.LEVEL_H - pos[1]), 1))
+            self.players.append(Player(random_offset(pos[0]), random_offset(pos[1]), 0, self))
+            self.players.append(Player(random_offset(self.pitch.level_w - pos[0]), random_offset(self.pitch.level_h - pos[1]), 1, self))
 
     
         for a, b in zip(self.players, self.players[::-1]):
             a.peer = b
 
-        self.goals = [Goal(i) for i in range(2)]
+        self.goals = [Goal(i, self) for i in range(2)]
+
+        # Position of each player and goal in self.players + self.goals, used to save references
+        # between them by number
+        self.entity_index = {entity: i for i, entity in enumerate(self.players + self.goals)}
+        self.entity_index[None] = -1
 
 
         self.teams[0].active_control_player = self.players[0]
@@ -164,27 +101,128 @@ class Game:
 
         self.kickoff_player = self.players[other_team]
 
-        self.kickoff_player.vpos = Vector2(constant.HALF_LEVEL_W - 30 + other_team * 60, constant.HALF_LEVEL_H)
+        self.kickoff_player.vpos = Vector2(self.pitch.half_level_w - 30 + other_team * 60, self.pitch.half_level_h)
 
-        self.ball = Ball()
+        self.ball = Ball(self)
 
         self.camera_focus = Vector2(self.ball.vpos)
 
         self.debug_shoot_target = None
 
+        self.grid.rebuild(self.players)
+
+        self.geometry_cache = None
+
+    def geometry(self):
+        # Pairwise distances and directions between players and goals. Built on first use and
+        # kept until a player moves or turns, so each phase of a tick shares one copy.
+        if self.geometry_cache is None:
+            self.geometry_cache = Geometry(self.players, self.goals)
+        return self.geometry_cache
+
+    def targetable(self, target, source):
+        # Whether source could pass to target - see Geometry.targetable. CPU players also won't
+        # pass if an opponent is in the way.
+        return bool(self.geometry().targetable([target], source, not self.teams[source.team].human())[0])
+
+    def costs(self, positions, team, handicap=0):
+        # Batched AI cost for a list of candidate positions (Vector2s), scored against the
+        # current positions of the other team, weighted as team's difficulty says - see cost.costs.
+        # Returns a NumPy array.
+        opponents = [(p.vpos.x, p.vpos.y) for p in self.players if p.team != team]
+        return cost.costs([(pos.x, pos.y) for pos in positions], opponents, team, handicap, self.pitch,
+                          self.teams[team].difficulty.cost_weights)
+
+    def opponent_positions(self, team):
+        # (x, y) of each player not on team, for cost()
+        return [(p.vpos.x, p.vpos.y) for p in self.players if p.team != team]
+
+    def cost(self, x, y, team, opponents, handicap=0):
+        # The AI cost of the single position (x, y) for team - see cost.cost. opponents is
+        # opponent_positions(team), which callers scoring several positions share.
+        return cost.cost(x, y, opponents, team, handicap, self.pitch, self.teams[team].difficulty.cost_weights)
+
+    def assign_roles(self, o):
+        # With the ball owned by o, pick the opponent nearest the goal o is attacking to mark it, if
+        # the defending team's difficulty has a goalie, and the one or two opponents to close o down. Lead players
+        # come from those not recovering from a kick, not under human control and not the goalie,
+        # taking the nearest to o in front of o, then the nearest behind, then the second nearest in
+        # front and behind, and so on - only the first two of those are needed, so rather than
+        # sorting every opponent, the nearest three each side (one may be the goalie) are kept
+        # while the opponents are looked at in a single pass. Ties go to whoever comes first in
+        # self.players.
+        team = o.team
+        owners_target_goal = self.goals[team]
+        other_team = self.teams[1 if team == 0 else 0]
+        human_player = other_team.active_control_player if other_team.human() else None
+        geometry = self.geometry()
+        owner_dist = geometry.distances_from(o)
+        goal_dist = geometry.distances_from(owners_target_goal) if other_team.difficulty.goalie_enabled else None
+
+        goalie = None
+        ahead, behind = [], []      # (distance from o, index, player), nearest first
+        for i, p in enumerate(self.players):
+            if p.team == team:
+                continue
+
+            if goal_dist is not None and (goalie is None or goal_dist[i] < goal_dist[goalie_index]):
+                goalie, goalie_index = p, i
+
+            if p.timer <= 0 and p != human_player:
+                side = ahead if (p.vpos.y > o.vpos.y if team == 0 else p.vpos.y < o.vpos.y) else behind
+                bisect.insort(side, (owner_dist[i], i, p))
+                del side[3:]
+
+        if goalie:
+            o.peer.mark = goalie.mark
+            goalie.mark = owners_target_goal
+
+        a = [p for d, i, p in ahead if p != goalie][:2]
+        b = [p for d, i, p in behind if p != goalie][:2]
+
+        NONE2 = [None] * 2
+        zipped = [s for t in zip(a+NONE2, b+NONE2) for s in t if s]
+
+        # With small teams there may not be enough eligible players for both leads
+        if len(zipped) > 0:
+            zipped[0].lead = constant.LEAD_DISTANCE_1
+        if other_team.difficulty.second_lead_enabled and len(zipped) > 1:
+            zipped[1].lead = constant.LEAD_DISTANCE_2
+
+    def snapshot(self):
+        # Everything the simulation depends on, as a fixed-layout binary string - see snapshot.py
+        return snapshot.save(self)
+
+    def restore(self, data):
+        # Return to the state of an earlier snapshot() of this game, or of another with the same
+        # number of players
+        snapshot.load(self, data)
+
+    def game_over(self):
+        # Same check the front end uses to leave State.PLAY - one team has reached the winning score
+        # and the post-goal pause is about to end
+        return max([team.score for team in self.teams]) == constant.WINNING_SCORE and self.score_timer == 1
+
     def update(self):
+        timing = self.timing
+        if timing:
+            timing.begin()
+
         self.score_timer -= 1
 
         if self.score_timer == 0:
             self.reset()
 
-        elif self.score_timer < 0 and abs(self.ball.vpos.y - constant.HALF_LEVEL_H) > constant.HALF_PITCH_H:
-            game.play_sound("goal", 2)
+        elif self.score_timer < 0 and abs(self.ball.vpos.y - self.pitch.half_level_h) > self.pitch.half_pitch_h:
+            self.play_sound("goal", 2)
 
-            self.scoring_team = 0 if self.ball.vpos.y < constant.HALF_LEVEL_H else 1
+            self.scoring_team = 0 if self.ball.vpos.y < self.pitch.half_level_h else 1
             self.teams[self.scoring_team].score += 1
             self.score_timer = 60     
 
+        if timing:
+            timing.lap(SCORE)
+
         for b in self.players:
             b.mark = b.peer
             b.lead = None
@@ -194,43 +232,23 @@ class Game:
 
         if self.ball.owner:
         
-            o = self.ball.owner
-            pos, team = o.vpos, o.team
-            owners_target_goal = game.goals[team]
-            other_team = 1 if team == 0 else 0
-
-            if self.difficulty.goalie_enabled:
-                nearest = min([p for p in self.players if p.team != team], key = dist_key(owners_target_goal.vpos))
+            self.assign_roles(self.ball.owner)
 
-                o.peer.mark = nearest.mark
-                nearest.mark = owners_target_goal
+            self.kickoff_player = None
 
-        
-            l = sorted([p for p in self.players
-                        if p.team != team
-                        and p.timer <= 0
-                        and (not self.teams[other_team].human() or p != self.teams[other_team].active_control_player)
-                        and not isinstance(p.mark, Goal)],
-                       key = dist_key(pos))
+        if timing:
+            timing.lap(LEADS)
 
-          
-            a = [p for p in l if (p.vpos.y > pos.y if team == 0 else p.vpos.y < pos.y)]
-            b = [p for p in l if p not in a]
+        for p in self.players:
+            p.update()
 
-            
-            NONE2 = [None] * 2
-            zipped = [s for t in zip(a+NONE2, b+NONE2) for s in t if s]
+        if timing:
+            timing.lap(PLAYERS)
 
+        self.ball.update()
 
-            zipped[0].lead = constant.LEAD_DISTANCE_1
-            if self.difficulty.second_lead_enabled:
-                zipped[1].lead = constant.LEAD_DISTANCE_2
-
-       
-            self.kickoff_player = None
-
-        for obj in self.players + [self.ball]:
-            obj.update()
+        if timing:
+            timing.lap(BALL)
 
         owner = self.ball.owner
 
@@ -248,187 +266,44 @@ class Game:
                     else:
                         return dist_to_ball
 
-                self.teams[team_num].active_control_player = min([p for p in game.players if p.team == team_num],
-                                                                 key = dist_key_weighted)
+                self.teams[team_num].active_control_player = self.grid.nearest(self.ball.vpos, where=lambda p: p.team == team_num,
+                                                                               key=dist_key_weighted, min_scale=0.5)[0]
+
+        if timing:
+            timing.lap(SWITCHING)
 
-        camera_ball_vec, distance = safe_normalise(self.camera_focus - self.ball.vpos)
+        camera_ball_vec, distance = util.safe_normalise(self.camera_focus - self.ball.vpos)
         if distance > 0:
             self.camera_focus -= camera_ball_vec * min(distance, 8)
 
-    def draw(self):
-        offset_x = max(0, min(constant.LEVEL_W - WIDTH, self.camera_focus.x - WIDTH / 2))
-        offset_y = max(0, min(constant.LEVEL_H - HEIGHT, self.camera_focus.y - HEIGHT / 2))
-        offset = Vector2(offset_x, offset_y)
-
-        screen.blit("pitch", (-offset_x, -offset_y))
-
-        
-        objects = sorted([self.ball] + self.players, key = lambda obj: obj.y)
-        objects = objects + [obj.shadow for obj in objects]
-        objects = [self.goals[0]] + objects + [self.goals[1]]
-
-        for obj in objects:
-            obj.draw(offset_x, offset_y)
-
-        for t in range(2):
-            if self.teams[t].human():
-                arrow_pos = self.teams[t].active_control_player.vpos - offset - Vector2(11, 45)
-                screen.blit("arrow" + str(t), arrow_pos)
-
-        if constant.DEBUG_SHOW_LEADS:
-            for p in self.players:
-                if game.ball.owner and p.lead:
-                    line_start = game.ball.owner.vpos - offset
-                    line_end = p.vpos - offset
-                    pygame.draw.line(screen.surface, (0,0,0), line_start, line_end)
-
-        if constant.DEBUG_SHOW_TARGETS:
-            for p in self.players:
-                line_start = p.debug_target - offset
-                line_end = p.vpos - offset
-                pygame.draw.line(screen.surface, (255,0,0), line_start, line_end)
-
-        if constant.DEBUG_SHOW_PEERS:
-            for p in self.players:
-                line_start = p.peer.vpos - offset
-                line_end = p.vpos - offset
-                pygame.draw.line(screen.surface, (0,0,255), line_start, line_end)
-
-        if constant.DEBUG_SHOW_SHOOT_TARGET:
-            if self.debug_shoot_target and self.ball.owner:
-                line_start = self.ball.owner.vpos - offset
-                line_end = self.debug_shoot_target - offset
-                pygame.draw.line(screen.surface, (255,0,255), line_start, line_end)
-        
-        if constant.DEBUG_SHOW_COSTS and self.ball.owner:
-            for x in range(0,constant.LEVEL_W,60):
-                for y in range(0, constant.LEVEL_H, 26):
-                    c = cost(Vector2(x,y), self.ball.owner.team)[0]
-                    screen_pos = Vector2(x,y)-offset
-                    screen_pos = (screen_pos.x,screen_pos.y)    
-                    screen.draw.text("{0:.0f}".format(c), center=screen_pos)
+        if timing:
+            timing.lap(CAMERA)
 
     def play_sound(self, name, c):
-        if state != State.MENU:
-            try:
-                getattr(sounds, name+str(random.randint(0, c-1))).play()
-            except:
-                
-                pass
-
-
-
-
-key_status = {}
-
-def key_just_pressed(key):
-    result = False
-
-
-    prev_status = key_status.get(key, False)
-
-    if not prev_status and keyboard[key]:
-        result = True
-
+        if self.audio:
+            self.audio.play(name+str(self.sound_random.randint(0, c-1)))
 
-    key_status[key] = keyboard[key]
-
-    return result
-
-
-
-
-
-
-
-
-def update():
-    global state, game, menu_state, menu_num_players, menu_difficulty
-
-    if state == State.MENU:
-        if key_just_pressed(keys.SPACE):
-            if menu_state == MenuState.NUM_PLAYERS:
-                if menu_num_players == 1:
-                    menu_state = MenuState.DIFFICULTY
-                else:
-                    state = State.PLAY
-                    menu_state = None
-                    game = Game(Controls(0), Controls(1))
-            else:
-                state = State.PLAY
-                menu_state = None
-                game = Game(Controls(0), None, menu_difficulty)
-        else:
-            selection_change = 0
-            if key_just_pressed(keys.DOWN):
-                selection_change = 1
-            elif key_just_pressed(keys.UP):
-                selection_change = -1
-            if selection_change != 0:
-                try:
-                    sounds.move.play()
-                except Exception:
-    
-                    pass
-                if menu_state == MenuState.NUM_PLAYERS:
-                    menu_num_players = 2 if menu_num_players == 1 else 1
-                else:
-                    menu_difficulty = (menu_difficulty + selection_change) % 3
 
+def play_match(difficulty=2, max_ticks=None, seed=None, team_size=None):
+    # Run a CPU-vs-CPU match with no window or mixer, as fast as the CPU allows.
+    # Returns the finished Game and the number of ticks simulated.
+    game = Game(None, None, difficulty, seed=seed, team_size=team_size)
+    ticks = 0
+    while not game.game_over() and (max_ticks is None or ticks < max_ticks):
         game.update()
+        ticks += 1
+    return game, ticks
 
-    elif state == State.PLAY:
-        if max([team.score for team in game.teams]) == 9 and game.score_timer == 1:
-            state = State.GAME_OVER
-        else:
-            game.update()
-
-    elif state == State.GAME_OVER:
-        if key_just_pressed(keys.SPACE):
-            state = State.MENU
-            menu_state = MenuState.NUM_PLAYERS
-            game = Game()
-
-def draw():
-    game.draw()
-
-    if state == State.MENU:
-  
-        if menu_state == MenuState.NUM_PLAYERS:
-            image = "menu0" + str(menu_num_players)
-        else:
-            image = "menu1" + str(menu_difficulty)
-        screen.blit(image, (0, 0))
-
-    elif state == State.PLAY:
-        screen.blit("bar", (constant.HALF_WINDOW_W - 176, 0))
-
-        for i in range(2):
-            screen.blit("s" + str(game.teams[i].score), (constant.HALF_WINDOW_W + 7 - 39 * i, 6))
-
-        if game.score_timer > 0:
-            screen.blit("goal", (constant.HALF_WINDOW_W - 300, HEIGHT / 2 - 88))
-
-    elif state == State.GAME_OVER:
-        img = "over" + str(int(game.teams[1].score > game.teams[0].score))
-        screen.blit(img, (0, 0))
-
-        for i in range(2):
-            img = "l" + str(i) + str(game.teams[i].score)
-            screen.blit(img, (constant.HALF_WINDOW_W + 25 - 125 * i, 144))
-
-try:
-    pygame.mixer.quit()
-    pygame.mixer.init(44100, -16, 2, 1024)
-except Exception:
-    pass
 
-state = State.MENU
+if __name__ == "__main__":
+    import sys
+    import time
 
-menu_state = MenuState.NUM_PLAYERS
-menu_num_players = 1
-menu_difficulty = 0
+    difficulty = int(sys.argv[1]) if len(sys.argv) > 1 else 2
 
-game = Game()
+    start = time.perf_counter()
+    game, ticks = play_match(difficulty)
+    elapsed = time.perf_counter() - start
 
-pgzrun.go()
+    print("{0}-{1} in {2} ticks, {3:.2f}s ({4:.0f} ticks/s)".format(
+        game.teams[0].score, game.teams[1].score, ticks, elapsed, ticks / elapsed))
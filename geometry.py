@@ -0,0 +1,77 @@
+import numpy as np
+import util
+
+class Geometry:
+    # Geometry between every player and goal, from a snapshot of their positions. Players come
+    # first, in game.players order, followed by the goals. Row i describes the vectors from point i
+    # to every point j, and is only worked out when first asked for - the AI looks at a few points'
+    # surroundings each tick, never all of them, so this keeps the cost linear in the number of
+    # players.
+    #   dist[j]    distance from i to j
+    #   unit[j]    unit vector from i to j, or (0, 0) where the distance is zero
+    #   facing[j]  dot product of unit[j] with the direction i is facing, for players
+    # Each value is calculated with the same operations, in the same order, as the Vector2 code it
+    # stands in for (safe_normalise, length, and the dot product), so the results are identical.
+    def __init__(self, players, goals):
+        num_players = len(players)
+
+        self.pos = np.array([(e.vpos.x, e.vpos.y) for e in players + goals])
+
+        self.players = players
+        self.team = np.array([e.team for e in players + goals])
+        self.num_players = num_players
+        self.index = {entity: i for i, entity in enumerate(players + goals)}
+        self.rows = {}
+
+    def row(self, i):
+        # (dist, unit, facing) for point i - facing is None for a goal
+        row = self.rows.get(i)
+        if row is None:
+            offset = self.pos - self.pos[i]
+            off_x = offset[:, 0]
+            off_y = offset[:, 1]
+            dist = np.sqrt(off_x * off_x + off_y * off_y)
+
+            with np.errstate(invalid="ignore", divide="ignore"):
+                unit = offset / dist[:, np.newaxis]
+            unit[dist == 0] = 0
+
+            if i < self.num_players:
+                fx, fy = util.DIRECTIONS[self.players[i].dir]
+                facing = unit[:, 0] * fx + unit[:, 1] * fy
+            else:
+                facing = None
+
+            row = self.rows[i] = (dist, unit, facing)
+        return row
+
+    def distances_from(self, entity):
+        # Distances from entity to every player and goal, as a list in point order
+        return self.row(self.index[entity])[0].tolist()
+
+    def targetable(self, targets, source, check_blockers):
+        # For each of targets, whether source could pass to it: same team, within 300 units, and
+        # roughly in the direction source is facing. With check_blockers, a target is also ruled
+        # out if a player from the other team is closer to source in roughly the same direction.
+        # Returns a boolean array.
+        s = self.index[source]
+        t = np.array([self.index[target] for target in targets], dtype=int)
+        dist, unit, facing = self.row(s)
+
+        d0 = dist[t]
+        result = (self.team[t] == self.team[s]) & (d0 > 0) & (d0 < 300) & (facing[t] > 0.8)
+
+        if check_blockers and result.any():
+            # Only targets that passed the tests above can be blocked, and only by players nearer
+            # than them - so within 300 units
+            n = self.num_players
+            candidates = np.flatnonzero(result)
+            near = np.flatnonzero((dist[:n] > 0) & (dist[:n] < 300))
+            v0 = unit[t[candidates]]
+            v1 = unit[near]
+            dots = v0[:, 0, np.newaxis] * v1[np.newaxis, :, 0] + v0[:, 1, np.newaxis] * v1[np.newaxis, :, 1]
+            blocked = (self.team[np.newaxis, near] != self.team[t[candidates], np.newaxis]) \
+                      & (dist[near] < d0[candidates, np.newaxis]) & (dots > 0.8)
+            result[candidates] &= ~blocked.any(axis=1)
+
+        return result
@@ -1,14 +1,13 @@
+from actor import MyActor
 
-import constant
-import game
-
-class Goal():
-    def __init__(self, team):
-        x = constant.HALF_LEVEL_W
-        y = 0 if team == 0 else constant.LEVEL_H
+class Goal(MyActor):
+    def __init__(self, team, game):
+        x = game.pitch.half_level_w
+        y = 0 if team == 0 else game.pitch.level_h
         super().__init__("goal" + str(team), x, y)
 
         self.team = team
+        self.game = game
 
     def active(self):
-        return abs(game.ball.vpos.y - self.vpos.y) < 500
\ No newline at end of file
+        return abs(self.game.ball.vpos.y - self.vpos.y) < 500
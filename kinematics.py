@@ -0,0 +1,70 @@
+import math
+import constant
+
+# Closed-form model of a kicked ball. After a kick the ball moves KICK_STRENGTH units in the first
+# frame and its velocity is multiplied by DRAG every frame after that, so the distance covered is a
+# geometric series: after n frames it has travelled KICK_STRENGTH * (1 - DRAG**n) / (1 - DRAG).
+
+# The AI stops counting once the ball slows to this speed or below - see frames_to_distance
+MIN_VEL = 0.25
+
+# Number of frames before the ball drops to MIN_VEL, i.e. the most frames_to_distance can return
+MAX_FRAMES = math.ceil(math.log(MIN_VEL / constant.KICK_STRENGTH) / math.log(constant.DRAG))
+
+def distance_after(frames, vel=constant.KICK_STRENGTH):
+    # Distance travelled in the given number of frames by a ball kicked at vel
+    return vel * (1 - constant.DRAG ** frames) / (1 - constant.DRAG)
+
+def max_distance(vel=constant.KICK_STRENGTH):
+    # The furthest a ball kicked at vel will ever travel, if nothing stops it
+    return vel / (1 - constant.DRAG)
+
+def _build_tables():
+    # TRAVELLED[n] is the distance covered after n frames, accumulated frame by frame exactly as
+    # the ball moves. FRAMES_BY_DISTANCE[d] is the number of frames needed to cover integer
+    # distance d, for every d up to the distance covered in MAX_FRAMES frames.
+    travelled = [0]
+    vel = constant.KICK_STRENGTH
+    for i in range(MAX_FRAMES):
+        travelled.append(travelled[-1] + vel)
+        vel *= constant.DRAG
+
+    frames_by_distance = []
+    frames = 0
+    for d in range(math.ceil(travelled[-1]) + 1):
+        while frames < MAX_FRAMES and travelled[frames] < d:
+            frames += 1
+        frames_by_distance.append(frames)
+
+    return travelled, frames_by_distance
+
+TRAVELLED, FRAMES_BY_DISTANCE = _build_tables()
+
+def frames_to_distance(distance):
+    # Number of frames a ball kicked at KICK_STRENGTH takes to cover the given distance, capped at
+    # MAX_FRAMES. Looks up the integer part of the distance and then steps forward over any frame
+    # boundaries between it and the exact distance - at most a handful, even where the ball is
+    # slowest.
+    if distance <= 0:
+        return 0
+    if distance >= len(FRAMES_BY_DISTANCE):
+        return MAX_FRAMES
+
+    frames = FRAMES_BY_DISTANCE[int(distance)]
+    while frames < MAX_FRAMES and TRAVELLED[frames] < distance:
+        frames += 1
+    return frames
+
+def lead_frames(origin, target, direction, speed, max_iterations=7):
+    # Solve for a lead pass. The receiver is at target and will run along direction (a unit vector)
+    # at speed, so the pass should be aimed at target + direction * speed * frames, where frames is
+    # how long the ball takes to get there. Each guess for frames gives a new aim point and so a new
+    # travel time; this repeats until the guess stops changing (usually after two or three rounds),
+    # giving up after max_iterations.
+    frames = 0
+    for i in range(max_iterations):
+        new_frames = frames_to_distance((target + direction * (speed * frames) - origin).length())
+        if new_frames == frames:
+            break
+        frames = new_frames
+    return frames
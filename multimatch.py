@@ -0,0 +1,627 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from game import Game, team_difficulties
+from pitch import Pitch
+from player import Player
+import constant
+import trajectory
+import util
+
+# Exact values of util.angle_to_vec(angle) for every angle the simulation asks for - the eight
+# directions, and up to two steps either side of them. Indexed by angle + 2.
+ANGLE_VEC = np.array([tuple(util.angle_to_vec(angle)) for angle in range(-2, 10)])
+DIR_VEC = ANGLE_VEC[2:10]
+SIN = np.array([util.sin(angle) for angle in range(8)])
+COS = np.array([util.cos(angle) for angle in range(8)])
+
+# Change to a player's direction each tick, indexed by how far it is from the direction it's turning to
+DIR_STEP = np.array([0, 1, 1, 1, 1, 7, 7, 7])
+TURN_HANDICAP = np.array(Player.TURN_HANDICAP, dtype=float)
+
+# Most points a ball trajectory can have: the ball is never faster than a kick, and drag slows it
+# by the same factor every frame
+MAX_FRAMES = math.ceil(math.log(trajectory.MIN_INTERCEPT_VEL / constant.KICK_STRENGTH) / math.log(constant.DRAG)) + 2
+
+
+class MatchBatch:
+    # M CPU-vs-CPU matches advanced in lockstep, with the state of every match in arrays that have
+    # the match as their first axis. update() does what Game.update does for each of them, but
+    # with each step done for every match at once as array operations, using masks where matches
+    # take different branches. Players still update one at a time, as each can see where those
+    # before it have moved to, but each player's update is done for all matches together.
+    # Each match has its own seed and difficulty - anything Game takes, so a level, a Difficulty
+    # (which includes the cost function's weights and the players' speeds) or a pair of either for
+    # the two teams. difficulty is either one of those for every match, or a list of one per match.
+    # So many AI settings can be tried in one batch, and against each other. Each match follows the
+    # same course as Game(None, None, difficulty, seed=seed, team_size=team_size): the arithmetic
+    # is done in the same order, so values agree to within rounding, and usually exactly.
+    # Only what affects the simulation is kept - there's no camera, sound or debug state.
+    # Entities are numbered as in Game.entity_index: players 0 to N - 1 (team 0, team 1, team 0
+    # and so on), then the two goals.
+    def __init__(self, seeds, difficulty=2, team_size=None):
+        self.seeds = list(seeds)
+        m = self.num_matches = len(self.seeds)
+
+        if not isinstance(difficulty, list):
+            difficulty = [difficulty] * m
+        teams = [team_difficulties(d) for d in difficulty]
+
+        # Each team's settings, match x team
+        setting = lambda name, dtype=float: np.array([[getattr(d, name) for d in pair] for pair in teams], dtype=dtype)
+        self.goalie_enabled = setting("goalie_enabled", bool)
+        self.second_lead_enabled = setting("second_lead_enabled", bool)
+        self.speed_boost = setting("speed_boost")
+        self.holdoff_timer = setting("holdoff_timer", int)
+        self.weights = setting("cost_weights")
+        self.default_speed = setting("default_speed")
+        self.intercept_speed = setting("intercept_speed")
+        self.with_ball_speed = setting("with_ball_speed")
+        self.lead_speed = setting("lead_speed")
+
+        self.team_size = team_size or len(constant.PLAYER_START_POS)
+        self.pitch = Pitch.for_team_size(self.team_size)
+        self.start_positions = self.pitch.home_positions(self.team_size)
+
+        n = self.num_players = self.team_size * 2
+        self.team = np.arange(n) % 2
+        self.peer = n - 1 - np.arange(n)
+        self.goal_pos = np.array([(self.pitch.half_level_w, 0), (self.pitch.half_level_w, self.pitch.level_h)], dtype=float)
+
+        self.random = [np.random.Generator(np.random.PCG64(seed)) for seed in self.seeds]
+
+        self.pos = np.zeros((m, n, 2))
+        self.home = np.zeros((m, n, 2))
+        self.dir = np.zeros((m, n), dtype=int)
+        self.anim_frame = np.zeros((m, n))
+        self.timer = np.zeros((m, n), dtype=int)
+        self.lead = np.zeros((m, n))             # lead distance, or 0 for none
+        self.mark = np.zeros((m, n), dtype=int)  # entity number
+
+        self.ball_pos = np.zeros((m, 2))
+        self.ball_vel = np.zeros((m, 2))
+        self.ball_timer = np.zeros(m, dtype=int)
+        self.owner = np.full(m, -1)              # player number, or -1 for none
+
+        self.score = np.zeros((m, 2), dtype=int)
+        self.score_timer = np.zeros(m, dtype=int)
+        self.scoring_team = np.ones(m, dtype=int)
+        self.kickoff = np.zeros(m, dtype=int)    # player number, or -1 once play has started
+        self.ticks = 0
+
+        # Each match's ball trajectory, kept from tick to tick while the ball follows it - points
+        # start to end (inclusive) of row m are the path from the ball's current position
+        self.traj_pos = np.zeros((m, MAX_FRAMES, 2))
+        self.traj_vel = np.zeros((m, MAX_FRAMES, 2))
+        self.traj_speed = np.zeros((m, MAX_FRAMES))
+        self.traj_start = np.zeros(m, dtype=int)
+        self.traj_end = np.full(m, -1)
+
+        self.reset(np.ones(m, dtype=bool))
+
+    def reset(self, matches):
+        # Line the given matches up for a kickoff, as Game.reset does
+        pitch = self.pitch
+        for m in np.flatnonzero(matches):
+            rng = self.random[m]
+            random_offset = lambda x: x + int(rng.integers(-32, 33))
+            for i, (x, y) in enumerate(self.start_positions):
+                for team, (home_x, home_y) in enumerate([(x, y), (pitch.level_w - x, pitch.level_h - y)]):
+                    home_x = random_offset(home_x)
+                    home_y = random_offset(home_y)
+                    self.home[m, i * 2 + team] = (home_x, home_y)
+                    self.pos[m, i * 2 + team] = (home_x, pitch.kickoff_y(home_y, team))
+
+            other_team = 1 if self.scoring_team[m] == 0 else 0
+            self.kickoff[m] = other_team
+            self.pos[m, other_team] = (pitch.half_level_w - 30 + other_team * 60, pitch.half_level_h)
+
+        self.dir[matches] = 0
+        self.anim_frame[matches] = -1
+        self.timer[matches] = 0
+        self.ball_pos[matches] = (pitch.half_level_w, pitch.half_level_h)
+        self.ball_vel[matches] = 0
+        self.ball_timer[matches] = 0
+        self.owner[matches] = -1
+        self.traj_end[matches] = -1
+
+    def game_over(self):
+        return (self.score.max(axis=1) == constant.WINNING_SCORE) & (self.score_timer == 1)
+
+    def update(self):
+        pitch = self.pitch
+
+        self.score_timer -= 1
+
+        reset = self.score_timer == 0
+        if reset.any():
+            self.reset(reset)
+
+        scored = (self.score_timer < 0) & (np.abs(self.ball_pos[:, 1] - pitch.half_level_h) > pitch.half_pitch_h)
+        if scored.any():
+            m = np.flatnonzero(scored)
+            team = np.where(self.ball_pos[m, 1] < pitch.half_level_h, 0, 1)
+            self.scoring_team[m] = team
+            self.score[m, team] += 1
+            self.score_timer[m] = 60
+
+        self.mark[:] = self.peer
+        self.lead[:] = 0
+
+        owned = self.owner >= 0
+        if owned.any():
+            self.assign_roles(np.flatnonzero(owned))
+        self.kickoff[owned] = -1
+
+        self.update_players()
+        self.update_ball()
+        self.ticks += 1
+
+    def entity_pos(self, m, entity):
+        # Positions of entity (a player or goal number) in each of matches m
+        pos = self.pos[m, np.minimum(entity, self.num_players - 1)]
+        return np.where((entity >= self.num_players)[:, np.newaxis], self.goal_pos[np.maximum(entity - self.num_players, 0)], pos)
+
+    def assign_roles(self, m):
+        # Game.assign_roles for matches m, whose balls are owned
+        k = np.arange(len(m))
+        n = self.num_players
+        owner = self.owner[m]
+        team = owner % 2
+        pos = self.pos[m]
+        owner_pos = pos[k, owner]
+        opponent = self.team[np.newaxis, :] != team[:, np.newaxis]
+
+        offset = pos - owner_pos[:, np.newaxis, :]
+        owner_dist = np.sqrt(offset[:, :, 0] * offset[:, :, 0] + offset[:, :, 1] * offset[:, :, 1])
+
+        with_goalie = self.goalie_enabled[m, 1 - team]
+        if with_goalie.any():
+            g = np.flatnonzero(with_goalie)
+            offset = pos[g] - self.goal_pos[team[g]][:, np.newaxis, :]
+            goal_dist = np.sqrt(offset[:, :, 0] * offset[:, :, 0] + offset[:, :, 1] * offset[:, :, 1])
+            goalie = np.where(opponent[g], goal_dist, np.inf).argmin(axis=1)
+
+            marks = self.mark[m[g]]
+            gk = np.arange(len(g))
+            marks[gk, self.peer[owner[g]]] = marks[gk, goalie]
+            marks[gk, goalie] = n + team[g]
+            self.mark[m[g]] = marks
+
+        eligible = opponent & (self.timer[m] <= 0) & (self.mark[m] < n)
+        owner_y = owner_pos[:, 1, np.newaxis]
+        ahead = np.where(team[:, np.newaxis] == 0, pos[:, :, 1] > owner_y, pos[:, :, 1] < owner_y)
+
+        def nearest_two(mask):
+            dist = np.where(mask, owner_dist, np.inf)
+            first = dist.argmin(axis=1)
+            has_first = np.isfinite(dist[k, first])
+            dist[k, first] = np.inf
+            second = dist.argmin(axis=1)
+            has_second = np.isfinite(dist[k, second])
+            return first, has_first, second, has_second
+
+        a0, has_a0, a1, has_a1 = nearest_two(eligible & ahead)
+        b0, has_b0, b1, has_b1 = nearest_two(eligible & ~ahead)
+
+        # Nearest in front, nearest behind, second nearest in front, second nearest behind
+        first = np.where(has_a0, a0, np.where(has_b0, b0, -1))
+        second = np.where(has_a0, np.where(has_b0, b0, np.where(has_a1, a1, -1)), np.where(has_b1, b1, -1))
+
+        lead = self.lead[m]
+        lead[k[first >= 0], first[first >= 0]] = constant.LEAD_DISTANCE_1
+        use_second = (second >= 0) & self.second_lead_enabled[m, 1 - team]
+        lead[k[use_second], second[use_second]] = constant.LEAD_DISTANCE_2
+        self.lead[m] = lead
+
+    def costs(self, m, positions, team, handicap=0):
+        # cost.costs for matches m, with team's weights: positions is K x C x 2, team K. Returns K x C.
+        w = self.weights[m, team]
+        x = positions[:, :, 0]
+        y = positions[:, :, 1]
+        pitch = self.pitch
+
+        goal_dx = x - pitch.half_level_w
+        goal_dy = y - np.where(team == 1, pitch.goal_line(0), pitch.goal_line(1))[:, np.newaxis]
+        result = w[:, 0, np.newaxis] / np.sqrt(goal_dx * goal_dx + goal_dy * goal_dy)
+
+        # Opponents in player order - every other player, starting with the first of the other team
+        opponents = self.pos[m[:, np.newaxis], (1 - team)[:, np.newaxis] + 2 * np.arange(self.team_size)]
+        dx = opponents[:, np.newaxis, :, 0] - x[:, :, np.newaxis]
+        dy = opponents[:, np.newaxis, :, 1] - y[:, :, np.newaxis]
+        near = w[:, 1, np.newaxis, np.newaxis] / np.maximum(24, np.sqrt(dx * dx + dy * dy))
+        result = result + np.cumsum(near, axis=2)[:, :, -1]
+
+        wide = (x - pitch.half_level_w) ** 2
+        result = result + (wide / w[:, 2, np.newaxis] - y * (4 * team[:, np.newaxis] - 2))
+
+        return result + handicap
+
+    def allow_movement(self, x, y):
+        pitch = self.pitch
+        dx = np.abs(x - pitch.half_level_w)
+        dy = np.abs(y - pitch.half_level_h)
+        return (dx <= pitch.half_level_w) & np.where(dx < pitch.half_goal_w + 20, dy < pitch.half_pitch_h, dy < pitch.half_level_h)
+
+    def on_pitch(self, x, y):
+        # pygame.Rect.collidepoint, which truncates the point's coordinates to integers
+        x = np.trunc(x)
+        y = np.trunc(y)
+        inside = lambda rect: (x >= rect.left) & (x < rect.right) & (y >= rect.top) & (y < rect.bottom)
+        pitch = self.pitch
+        return inside(pitch.pitch_rect) | inside(pitch.goal_rects[0]) | inside(pitch.goal_rects[1])
+
+    def ball_bounds(self, x, y):
+        pitch = self.pitch
+        in_goal_mouth = np.abs(y - pitch.half_level_h) > pitch.half_pitch_h
+        bounds_x = np.where(in_goal_mouth[:, np.newaxis], pitch.goal_bounds_x, pitch.pitch_bounds_x)
+        in_line_with_goal = np.abs(x - pitch.half_level_w) < pitch.half_goal_w
+        bounds_y = np.where(in_line_with_goal[:, np.newaxis], pitch.goal_bounds_y, pitch.pitch_bounds_y)
+        return bounds_x, bounds_y
+
+    @staticmethod
+    def ball_physics(pos, vel, bounds):
+        # util.ball_physics for arrays
+        pos = pos + vel
+        bounce = (pos < bounds[:, 0]) | (pos > bounds[:, 1])
+        pos = np.where(bounce, pos - vel, pos)
+        vel = np.where(bounce, -vel, vel)
+        return pos, vel * constant.DRAG
+
+    def update_trajectories(self, m):
+        # Make sure each of matches m has the trajectory of its ball as it is now. Where the ball
+        # has moved one step along the trajectory from last tick, that's just a matter of moving
+        # the start on - Trajectory and Ball.update do exactly the same arithmetic.
+        start = self.traj_start[m]
+        next_point = np.minimum(start + 1, MAX_FRAMES - 1)
+        follows = (start + 1 <= self.traj_end[m]) \
+                  & (self.traj_pos[m, next_point] == self.ball_pos[m]).all(axis=1) \
+                  & (self.traj_vel[m, next_point] == self.ball_vel[m]).all(axis=1)
+        self.traj_start[m[follows]] += 1
+
+        rebuild = m[~follows]
+        if len(rebuild) == 0:
+            return
+
+        x, y = self.ball_pos[rebuild, 0], self.ball_pos[rebuild, 1]
+        vel_x, vel_y = self.ball_vel[rebuild, 0], self.ball_vel[rebuild, 1]
+        end = np.full(len(rebuild), -1)
+        for frame in range(MAX_FRAMES):
+            speed = np.sqrt(vel_x * vel_x + vel_y * vel_y)
+            moving = end < 0
+            self.traj_pos[rebuild[moving], frame, 0] = x[moving]
+            self.traj_pos[rebuild[moving], frame, 1] = y[moving]
+            self.traj_vel[rebuild[moving], frame, 0] = vel_x[moving]
+            self.traj_vel[rebuild[moving], frame, 1] = vel_y[moving]
+            self.traj_speed[rebuild[moving], frame] = speed[moving]
+            end[moving & (speed <= trajectory.MIN_INTERCEPT_VEL)] = frame
+            if (end >= 0).all():
+                break
+
+            bounds_x, bounds_y = self.ball_bounds(x, y)
+            x, vel_x = self.ball_physics(x, vel_x, bounds_x)
+            y, vel_y = self.ball_physics(y, vel_y, bounds_y)
+
+        self.traj_start[rebuild] = 0
+        self.traj_end[rebuild] = end
+
+    def intercept(self, m, pos, speed, reach):
+        # Trajectory.intercept_frame and position for a player at pos (K x 2) and with speed (K) in
+        # each of matches m
+        k = np.arange(len(m))
+        start = self.traj_start[m]
+        last = self.traj_end[m] - start
+        frames = np.arange(MAX_FRAMES)
+        index = np.minimum(start[:, np.newaxis] + frames, MAX_FRAMES - 1)
+        points = self.traj_pos[m[:, np.newaxis], index]
+        in_path = frames <= last[:, np.newaxis]
+
+        slow_from = ((self.traj_speed[m[:, np.newaxis], index] > speed[:, np.newaxis]) & in_path).sum(axis=1)
+
+        dx = points[:, :, 0] - pos[:, 0, np.newaxis]
+        dy = points[:, :, 1] - pos[:, 1, np.newaxis]
+        reachable = np.sqrt(dx * dx + dy * dy) <= speed[:, np.newaxis] * frames + reach
+        early = reachable & (frames < slow_from[:, np.newaxis])
+        found = early.any(axis=1)
+        frame = np.where(found, early.argmax(axis=1), 0)
+
+        # Binary search over the rest of the path, where reachability can no longer be lost
+        lo, hi = slow_from.copy(), last.copy()
+        searching = ~found & (lo < hi)
+        while searching.any():
+            mid = (lo + hi) // 2
+            ok = reachable[k, np.minimum(mid, MAX_FRAMES - 1)]
+            hi = np.where(searching & ok, mid, hi)
+            lo = np.where(searching & ~ok, mid + 1, lo)
+            searching = searching & (lo < hi)
+        frame = np.where(found, frame, lo)
+
+        return points[k, frame]
+
+    def update_players(self):
+        m_all = np.arange(self.num_matches)
+        pitch = self.pitch
+        ball_x = self.ball_pos[:, 0]
+        ball_y = self.ball_pos[:, 1]
+        owner = self.owner
+        has_owner = owner >= 0
+        owner_team = owner % 2
+        pre_kickoff = self.kickoff >= 0
+
+        free = np.flatnonzero(~has_owner)
+        if len(free):
+            self.update_trajectories(free)
+
+        for j in range(self.num_players):
+            t = j % 2
+            self.timer[:, j] -= 1
+
+            home_x = self.home[:, j, 0]
+            home_y = self.home[:, j, 1]
+            target_x = home_x.copy()
+            target_y = home_y.copy()
+            speed = self.default_speed[:, t].copy()
+            active = np.abs(ball_y - home_y) < 400
+
+            # CPU player with the ball: pick the cheapest of five steps, turning at most 90 degrees
+            with_ball = np.flatnonzero(owner == j)
+            if len(with_ball):
+                turns = self.dir[with_ball, j, np.newaxis] + np.arange(-2, 3)
+                candidates = self.pos[with_ball, j, np.newaxis, :] + ANGLE_VEC[turns + 2] * 3
+                costs = self.costs(with_ball, candidates, np.full(len(with_ball), t), TURN_HANDICAP)
+                target = candidates[np.arange(len(with_ball)), costs.argmin(axis=1)]
+                target_x[with_ball] = target[:, 0]
+                target_y[with_ball] = target[:, 1]
+                speed[with_ball] = self.with_ball_speed[with_ball, t] + self.speed_boost[with_ball, t]
+
+            # Teammate of the player with the ball, supporting it
+            supporting = has_owner & (owner != j) & (owner_team == t) & active
+            direction = -1 if t == 0 else 1
+            target_x = np.where(supporting, (ball_x + home_x) / 2, target_x)
+            target_y = np.where(supporting, (ball_y + 400 * direction + home_y) / 2, target_y)
+
+            # Opponent of the player with the ball, closing it down
+            against = has_owner & (owner_team != t)
+            leading = np.flatnonzero(against & (self.lead[:, j] > 0))
+            if len(leading):
+                o = owner[leading]
+                target = self.pos[leading, o] + DIR_VEC[self.dir[leading, o]] * self.lead[leading, j, np.newaxis]
+                target_x[leading] = np.maximum(pitch.ai_min_x, np.minimum(pitch.ai_max_x, target[:, 0]))
+                target_y[leading] = np.maximum(pitch.ai_min_y, np.minimum(pitch.ai_max_y, target[:, 1]))
+                speed[leading] = self.lead_speed[leading, t]
+
+            # ... or marking a player or the goal
+            marking = np.flatnonzero(against & (self.lead[:, j] == 0))
+            if len(marking):
+                mark = self.mark[marking, j]
+                is_goal = mark >= self.num_players
+                mark_pos = self.entity_pos(marking, mark)
+                mark_y = np.where(is_goal, mark_pos[:, 1], self.home[marking, np.minimum(mark, self.num_players - 1), 1])
+                mark_active = np.abs(ball_y[marking] - mark_y) < np.where(is_goal, 500, 400)
+                marking, mark_pos, is_goal = marking[mark_active], mark_pos[mark_active], is_goal[mark_active]
+
+                offset = self.ball_pos[marking] - mark_pos
+                length = np.sqrt(offset[:, 0] * offset[:, 0] + offset[:, 1] * offset[:, 1])
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    vec = np.where(length[:, np.newaxis] > 0, offset / length[:, np.newaxis], 0)
+                length = np.where(is_goal, np.minimum(150, length), length / 2)
+                target = mark_pos + vec * length[:, np.newaxis]
+                target_x[marking] = target[:, 0]
+                target_y[marking] = target[:, 1]
+
+            # Nobody has the ball: go for it, or at a kickoff stay level with where they are
+            kickoff_player = self.kickoff == j
+            chasing = np.flatnonzero(~has_owner & ((pre_kickoff & kickoff_player) | (~pre_kickoff & active)))
+            if len(chasing):
+                speed[chasing] = self.intercept_speed[chasing, t]
+                target = self.intercept(chasing, self.pos[chasing, j], speed[chasing], constant.DRIBBLE_DIST_X)
+                target_x[chasing] = target[:, 0]
+                target_y[chasing] = target[:, 1]
+            waiting = ~has_owner & pre_kickoff & ~kickoff_player
+            target_y = np.where(waiting, self.pos[:, j, 1], target_y)
+
+            self.move_player(j, m_all, target_x, target_y, speed)
+
+    def move_player(self, j, m, target_x, target_y, speed):
+        # The end of Player.update: step towards the target and turn
+        x = self.pos[:, j, 0]
+        y = self.pos[:, j, 1]
+        dx = target_x - x
+        dy = target_y - y
+        distance = np.sqrt(dx * dx + dy * dy)
+        moving = distance > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vec_x = np.where(moving, dx / distance, 0)
+            vec_y = np.where(moving, dy / distance, 0)
+        distance = np.minimum(distance, speed)
+
+        step_x = x + vec_x * distance
+        x = np.where(moving & self.allow_movement(step_x, y), step_x, x)
+        step_y = y + vec_y * distance
+        y = np.where(moving & self.allow_movement(x, step_y), step_y, y)
+
+        ball_dx = self.ball_pos[:, 0] - self.pos[:, j, 0]
+        ball_dy = self.ball_pos[:, 1] - self.pos[:, j, 1]
+        target_dir = np.where(moving, vec_to_angle(vec_x, vec_y), vec_to_angle(ball_dx, ball_dy))
+
+        self.anim_frame[:, j] = np.where(moving, (self.anim_frame[:, j] + np.maximum(distance, 1.5)) % 72, -1)
+        self.pos[:, j, 0] = x
+        self.pos[:, j, 1] = y
+        self.dir[:, j] = (self.dir[:, j] + DIR_STEP[(target_dir - self.dir[:, j]) % 8]) % 8
+
+    def update_ball(self):
+        self.ball_timer -= 1
+
+        # Dribbling: follow the owner, unless that would take the ball off the pitch
+        dribbling = np.flatnonzero(self.owner >= 0)
+        free = np.flatnonzero(self.owner < 0)
+        if len(dribbling):
+            o = self.owner[dribbling]
+            owner_pos = self.pos[dribbling, o]
+            owner_dir = self.dir[dribbling, o]
+            new_x = avg(self.ball_pos[dribbling, 0], owner_pos[:, 0] + constant.DRIBBLE_DIST_X * SIN[owner_dir])
+            new_y = avg(self.ball_pos[dribbling, 1], owner_pos[:, 1] - constant.DRIBBLE_DIST_Y * COS[owner_dir])
+            on = self.on_pitch(new_x, new_y)
+
+            self.ball_pos[dribbling[on], 0] = new_x[on]
+            self.ball_pos[dribbling[on], 1] = new_y[on]
+
+            lost = dribbling[~on]
+            self.timer[lost, o[~on]] = 60
+            self.ball_vel[lost] = ANGLE_VEC[owner_dir[~on] + 2] * 3
+            self.owner[lost] = -1
+
+        if len(free):
+            bounds_x, bounds_y = self.ball_bounds(self.ball_pos[free, 0], self.ball_pos[free, 1])
+            self.ball_pos[free, 0], self.ball_vel[free, 0] = self.ball_physics(self.ball_pos[free, 0], self.ball_vel[free, 0], bounds_x)
+            self.ball_pos[free, 1], self.ball_vel[free, 1] = self.ball_physics(self.ball_pos[free, 1], self.ball_vel[free, 1], bounds_y)
+
+        # Tackles and pickups, in player order
+        m_all = np.arange(self.num_matches)
+        for j in range(self.num_players):
+            offset = self.pos[:, j] - self.ball_pos
+            near = np.sqrt(offset[:, 0] * offset[:, 0] + offset[:, 1] * offset[:, 1]) <= constant.DRIBBLE_DIST_X
+            takes = near & (self.timer[:, j] < 0) & ((self.owner < 0) | (self.owner % 2 != j % 2))
+            if takes.any():
+                tackled = takes & (self.owner >= 0)
+                self.timer[m_all[tackled], self.owner[tackled]] = 60
+                self.ball_timer[takes] = self.holdoff_timer[takes, j % 2]
+                self.owner[takes] = j
+
+        owned = np.flatnonzero(self.owner >= 0)
+        if len(owned):
+            self.pass_or_shoot(owned)
+
+    def pass_or_shoot(self, m):
+        # The CPU owner of the ball in each of matches m looks for the nearest teammate (or the goal
+        # it's attacking) it could pass to, and kicks the ball there if that's better placed
+        k = np.arange(len(m))
+        n = self.num_players
+        owner = self.owner[m]
+        team = owner % 2
+
+        points = np.concatenate([self.pos[m], np.broadcast_to(self.goal_pos, (len(m), 2, 2))], axis=1)
+        point_team = np.concatenate([self.team, [0, 1]])
+        offset = points - points[k, owner][:, np.newaxis, :]
+        dist = np.sqrt(offset[:, :, 0] * offset[:, :, 0] + offset[:, :, 1] * offset[:, :, 1])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            unit = offset / dist[:, :, np.newaxis]
+        unit[dist == 0] = 0
+        facing_vec = DIR_VEC[self.dir[m, owner]]
+        facing = unit[:, :, 0] * facing_vec[:, 0, np.newaxis] + unit[:, :, 1] * facing_vec[:, 1, np.newaxis]
+
+        # Candidates: the owner's team in player order, then the goal it's attacking
+        candidates = np.concatenate([team[:, np.newaxis] + 2 * np.arange(self.team_size), (n + team)[:, np.newaxis]], axis=1)
+        d0 = dist[k[:, np.newaxis], candidates]
+        ok = (d0 > 0) & (d0 < 300) & (facing[k[:, np.newaxis], candidates] > 0.8)
+
+        # Blocked by a nearer opponent in roughly the same direction
+        v0 = unit[k[:, np.newaxis], candidates]
+        v1 = unit[:, :n]
+        dots = v0[:, :, np.newaxis, 0] * v1[:, np.newaxis, :, 0] + v0[:, :, np.newaxis, 1] * v1[:, np.newaxis, :, 1]
+        d1 = dist[:, np.newaxis, :n]
+        blocked = (point_team[np.newaxis, np.newaxis, :n] != team[:, np.newaxis, np.newaxis]) \
+                  & (d1 > 0) & (d1 < d0[:, :, np.newaxis]) & (dots > 0.8)
+        ok &= ~blocked.any(axis=2)
+
+        has_target = ok.any(axis=1)
+        choice = np.where(ok, d0, np.inf).argmin(axis=1)
+        target = candidates[k, choice]
+
+        shooting = np.flatnonzero(has_target & (self.ball_timer[m] <= 0))
+        if len(shooting) == 0:
+            return
+        ms = m[shooting]
+        target_pos = self.entity_pos(ms, target[shooting])
+        owner_pos = self.pos[ms, owner[shooting]]
+        costs = self.costs(ms, np.stack([target_pos, owner_pos], axis=1), team[shooting])
+        kicking = costs[:, 0] < costs[:, 1]
+
+        ms, target_pos, kicker = ms[kicking], target_pos[kicking], owner[shooting][kicking]
+        offset = target_pos - self.ball_pos[ms]
+        length = np.sqrt(offset[:, 0] * offset[:, 0] + offset[:, 1] * offset[:, 1])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            vec = np.where(length[:, np.newaxis] > 0, offset / length[:, np.newaxis], 0)
+        self.timer[ms, kicker] = 10
+        self.ball_vel[ms] = vec * constant.KICK_STRENGTH
+        self.owner[ms] = -1
+
+    def play(self, max_ticks=None):
+        # Update until every match is over, or for max_ticks ticks. Returns the score of each
+        # match and the tick it ended on (or -1 if it didn't). Matches that have finished carry on
+        # being updated along with the rest, but their results are taken when they end.
+        scores = np.zeros((self.num_matches, 2), dtype=int)
+        ended = np.full(self.num_matches, -1)
+        while (ended < 0).any() and (max_ticks is None or self.ticks < max_ticks):
+            self.update()
+            over = self.game_over() & (ended < 0)
+            scores[over] = self.score[over]
+            ended[over] = self.ticks
+        running = ended < 0
+        scores[running] = self.score[running]
+        return scores, ended
+
+
+def avg(a, b):
+    # util.avg for arrays
+    return np.where(np.abs(b - a) < 1, b, (a + b) / 2)
+
+
+def vec_to_angle(x, y):
+    # util.vec_to_angle for arrays of vector components
+    return (4 * np.arctan2(x, -y) / np.pi + 8.5).astype(int) % 8
+
+
+def compare(batch, games):
+    # Largest difference between any player or ball position in batch and in the corresponding
+    # Games, and whether everything else matches exactly
+    worst = 0
+    same = True
+    for m, game in enumerate(games):
+        pos = np.array([(p.vpos.x, p.vpos.y) for p in game.players])
+        worst = max(worst, np.abs(pos - batch.pos[m]).max(), np.abs(np.array(game.ball.vpos) - batch.ball_pos[m]).max(),
+                    np.abs(np.array(game.ball.vel) - batch.ball_vel[m]).max())
+        owner = game.entity_index[game.ball.owner]
+        same = same and owner == batch.owner[m] and [p.dir for p in game.players] == batch.dir[m].tolist() \
+               and [p.timer for p in game.players] == batch.timer[m].tolist() \
+               and [t.score for t in game.teams] == batch.score[m].tolist()
+    return worst, same
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many matches in lockstep, checking some against Game")
+    parser.add_argument("-m", "--matches", type=int, default=256)
+    parser.add_argument("-t", "--ticks", type=int, default=1000)
+    parser.add_argument("-d", "--difficulty", type=int, default=2, choices=range(3))
+    parser.add_argument("--team-size", type=int, default=None)
+    parser.add_argument("--check", type=int, default=4, help="how many of the matches to check against Game")
+    args = parser.parse_args()
+
+    seeds = list(range(args.matches))
+    batch = MatchBatch(seeds, args.difficulty, args.team_size)
+    games = [Game(None, None, args.difficulty, seed=seed, team_size=args.team_size) for seed in seeds[:args.check]]
+
+    elapsed = 0
+    worst, same = 0, True
+    for tick in range(args.ticks):
+        start = time.perf_counter()
+        batch.update()
+        elapsed += time.perf_counter() - start
+
+        for game in games:
+            game.update()
+        if games:
+            error, exact = compare(batch, games)
+            worst = max(worst, error)
+            if same and not exact:
+                print("first mismatch at tick {0}".format(tick + 1))
+            same = same and exact
+
+    print("{0} matches x {1} ticks in {2:.2f}s: {3:.0f} match ticks/s".format(
+        args.matches, args.ticks, elapsed, args.matches * args.ticks / elapsed))
+    if games:
+        print("checked {0}: largest position difference {1:.3g}, {2}".format(
+            len(games), worst, "other state identical" if same else "other state differs"))
@@ -0,0 +1,294 @@
+import argparse
+import hashlib
+import heapq
+import multiprocessing
+import random
+import socket
+import struct
+import time
+
+from game import Game
+from replay import ReplayControls
+
+# Packets, sent over UDP:
+#   HELLO  joining peer -> host, repeated until START arrives
+#   START  host -> joining peer: match seed and difficulty
+#   INPUTS either way: the highest tick + 1 up to which the sender has every input from the other
+#          peer (an acknowledgement), then the sender's own inputs from tick `first` onwards, one
+#          byte (a Controls.state() value) per tick
+HELLO, START, INPUTS = range(3)
+PACKET_TYPE = struct.Struct("<B")
+START_BODY = struct.Struct("<QB")
+INPUTS_BODY = struct.Struct("<II")
+
+# How many ticks ahead of the last confirmed input from the other peer the game may run, guessing
+# the other peer's input, before it waits. Also the furthest back a rollback can go.
+MAX_ROLLBACK = 8
+
+
+class Link:
+    # A UDP socket connected to one peer. Outgoing packets can be held back by a simulated network
+    # delay of latency plus up to jitter seconds (so they may arrive out of order), and dropped
+    # with probability loss, to test how a session copes with a poor connection.
+    def __init__(self, sock, peer=None, latency=0, jitter=0, loss=0, seed=None):
+        self.sock = sock
+        self.sock.setblocking(False)
+        self.peer = peer
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.queue = []
+        self.sequence = 0
+
+    def send(self, data):
+        if self.random.random() < self.loss:
+            return
+        due = time.perf_counter() + self.latency + self.random.random() * self.jitter
+        heapq.heappush(self.queue, (due, self.sequence, data))
+        self.sequence += 1
+        self.pump()
+
+    def pump(self):
+        # Send every held-back packet that is due
+        now = time.perf_counter()
+        while self.queue and self.queue[0][0] <= now:
+            due, sequence, data = heapq.heappop(self.queue)
+            try:
+                self.sock.sendto(data, self.peer)
+            except OSError:
+                pass
+
+    def receive(self):
+        # Packets that have arrived since the last call. A link created without a peer adopts the
+        # address of the first packet it receives.
+        self.pump()
+        packets = []
+        while True:
+            try:
+                data, address = self.sock.recvfrom(4096)
+            except (BlockingIOError, ConnectionResetError):
+                return packets
+            if self.peer is None:
+                self.peer = address
+            if address == self.peer:
+                packets.append(data)
+
+
+def connect(host, port, seed=None, difficulty=2, timeout=30, **shim):
+    # Set up a match between two peers. With host None, wait on port for the other peer to join,
+    # and pick the match seed and difficulty; otherwise join the peer waiting at (host, port).
+    # Returns the Link, the team this peer controls, the seed and the difficulty. shim is passed on
+    # to Link.
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    deadline = time.perf_counter() + timeout
+
+    if host is None:
+        sock.bind(("", port))
+        link = Link(sock, **shim)
+        seed = random.getrandbits(64) if seed is None else seed
+        start = PACKET_TYPE.pack(START) + START_BODY.pack(seed, difficulty)
+
+        # Wait for HELLO, and reply with START - the joining peer's first INPUTS packet confirms it
+        # arrived, and the session repeats START until then if needed
+        while time.perf_counter() < deadline:
+            if any(packet[0] == HELLO for packet in link.receive()):
+                link.send(start)
+                return link, 0, seed, difficulty
+            time.sleep(0.005)
+    else:
+        link = Link(sock, (socket.gethostbyname(host), port), **shim)
+        next_hello = 0
+        while time.perf_counter() < deadline:
+            if time.perf_counter() >= next_hello:
+                link.send(PACKET_TYPE.pack(HELLO))
+                next_hello = time.perf_counter() + 0.1
+            for packet in link.receive():
+                if packet[0] == START:
+                    seed, difficulty = START_BODY.unpack_from(packet, PACKET_TYPE.size)
+                    return link, 1, seed, difficulty
+            time.sleep(0.005)
+
+    sock.close()
+    raise TimeoutError("No response from the other player")
+
+
+class RollbackSession:
+    # A two-player match between peers that only exchange their inputs. Each peer runs the whole
+    # simulation. Until the other peer's input for a tick arrives, it's predicted to be the same as
+    # the last one received. When a prediction turns out wrong, the game is restored to a snapshot
+    # from before the first wrong tick and those ticks are simulated again with the right input.
+    # Both teams are driven through ReplayControls, fed from the inputs passed to update() and
+    # received from the other peer.
+    def __init__(self, link, team, seed, difficulty=2, audio=None, max_rollback=MAX_ROLLBACK):
+        self.link = link
+        self.team = team
+        self.max_rollback = max_rollback
+        self.controls = [ReplayControls(False), ReplayControls(False)]
+        self.game = Game(self.controls[0], self.controls[1], difficulty, audio=audio, seed=seed)
+        self.audio = audio
+
+        self.tick = 0               # ticks simulated
+        self.local_inputs = []
+        self.remote_inputs = {}     # tick: input, as received
+        self.confirmed = 0          # remote input is known for every tick before this
+        self.peer_confirmed = 0     # the other peer has every local input before this
+        self.used = []              # remote input used for each tick simulated, known or guessed
+        self.saved = {}             # tick: state before that tick, for ticks that may be rolled back
+
+        self.rollbacks = 0
+        self.resimulated = 0
+        self.longest_rollback = 0   # seconds
+
+    def predicted(self, tick):
+        if tick in self.remote_inputs:
+            return self.remote_inputs[tick]
+        return self.remote_inputs.get(self.confirmed - 1, 0)
+
+    def simulate(self):
+        tick = self.tick
+        self.saved[tick] = (self.game.snapshot(), [c.prev_shoot for c in self.controls])
+
+        remote = self.predicted(tick)
+        if tick < len(self.used):
+            self.used[tick] = remote
+        else:
+            self.used.append(remote)
+
+        self.controls[self.team].input = self.local_inputs[tick]
+        self.controls[1 - self.team].input = remote
+        self.game.update()
+        self.tick += 1
+
+    def rollback(self, tick):
+        # Go back to the state before tick, then simulate forward again to where we were, without
+        # replaying sounds
+        start = time.perf_counter()
+        end = self.tick
+        state, prev_shoot = self.saved[tick]
+        self.game.restore(state)
+        for c, held in zip(self.controls, prev_shoot):
+            c.prev_shoot = held
+        self.tick = tick
+
+        self.game.audio = None
+        while self.tick < end:
+            self.simulate()
+        self.game.audio = self.audio
+
+        self.rollbacks += 1
+        self.resimulated += end - tick
+        self.longest_rollback = max(self.longest_rollback, time.perf_counter() - start)
+
+    def poll(self):
+        # Take in inputs from the other peer, and roll back to the first tick already simulated
+        # with a guess that turns out to be wrong
+        first_unconfirmed = self.confirmed
+
+        for packet in self.link.receive():
+            if packet[0] == HELLO and self.team == 0:
+                # The joining peer didn't get START
+                self.link.send(PACKET_TYPE.pack(START) + START_BODY.pack(self.game.seed, self.game.difficulty_level))
+            elif packet[0] == INPUTS:
+                ack, first = INPUTS_BODY.unpack_from(packet, PACKET_TYPE.size)
+                self.peer_confirmed = max(self.peer_confirmed, ack)
+                for tick, value in enumerate(packet[PACKET_TYPE.size + INPUTS_BODY.size:], first):
+                    if tick >= self.confirmed:
+                        self.remote_inputs[tick] = value
+
+        while self.confirmed in self.remote_inputs:
+            self.confirmed += 1
+
+        # Guesses are based on the last confirmed input, so a newly confirmed input can change the
+        # guess for later ticks too
+        for tick in range(first_unconfirmed, self.tick):
+            if self.used[tick] != self.predicted(tick):
+                self.rollback(tick)
+                break
+
+        # States from before the last confirmed tick can never be needed again
+        for tick in [t for t in self.saved if t < min(self.confirmed, self.tick)]:
+            del self.saved[tick]
+
+    def send(self):
+        first = self.peer_confirmed
+        self.link.send(PACKET_TYPE.pack(INPUTS) + INPUTS_BODY.pack(self.confirmed, first)
+                       + bytes(self.local_inputs[first:]))
+
+    def update(self, local_input):
+        # Advance one tick with this peer's input (a Controls.state() value), unless the game has
+        # got too far ahead of the other peer's inputs. Returns whether the game advanced.
+        self.poll()
+
+        advanced = self.tick - self.confirmed < self.max_rollback
+        if advanced:
+            self.local_inputs.append(local_input)
+            self.simulate()
+
+        self.send()
+        return advanced
+
+    def synchronised(self):
+        # Whether every tick simulated so far used the other peer's real input
+        return self.confirmed >= self.tick
+
+
+def run_test_peer(host, port, ticks, fps, shim, result):
+    # One side of a scripted headless test match: plays ticks ticks of random input at fps ticks
+    # per second, carries on exchanging packets until every input has been confirmed both ways,
+    # then reports a hash of the final state
+    link, team, seed, difficulty = connect(host, port, seed=12345, difficulty=1, **shim)
+    session = RollbackSession(link, team, seed, difficulty)
+    inputs = random.Random(team)
+    value = 0
+
+    start = time.perf_counter()
+    next_tick = start
+    while session.tick < ticks or not session.synchronised() or session.peer_confirmed < ticks:
+        if session.tick < ticks:
+            if inputs.random() < 0.1:
+                value = inputs.randrange(32)
+            session.update(value)
+        else:
+            session.poll()
+            session.send()
+        next_tick += 1 / fps
+        time.sleep(max(0, next_tick - time.perf_counter()))
+
+    # Keep answering for a moment in case the other peer is still waiting for an acknowledgement
+    end = time.perf_counter() + 0.5
+    while time.perf_counter() < end:
+        session.poll()
+        session.send()
+        time.sleep(1 / fps)
+
+    result.put((team, hashlib.md5(session.game.snapshot()).hexdigest(), [t.score for t in session.game.teams],
+                session.rollbacks, session.resimulated, session.longest_rollback, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    # python netplay.py - play a scripted match between two processes over localhost, through the
+    # simulated network conditions given, and check that both ended up in the same state
+    parser = argparse.ArgumentParser(description="Test rollback netplay between two local processes")
+    parser.add_argument("--port", type=int, default=5757)
+    parser.add_argument("--ticks", type=int, default=600)
+    parser.add_argument("--fps", type=float, default=60)
+    parser.add_argument("--latency", type=float, default=0.05, help="one-way delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra random delay in seconds")
+    parser.add_argument("--loss", type=float, default=0.05, help="fraction of packets dropped")
+    args = parser.parse_args()
+
+    shim = {"latency": args.latency, "jitter": args.jitter, "loss": args.loss}
+    result = multiprocessing.Queue()
+    peers = [multiprocessing.Process(target=run_test_peer, args=(None, args.port, args.ticks, args.fps, shim, result)),
+             multiprocessing.Process(target=run_test_peer, args=("127.0.0.1", args.port, args.ticks, args.fps, shim, result))]
+    for p in peers:
+        p.start()
+    results = sorted(result.get(timeout=args.ticks / args.fps + 60) for p in peers)
+    for p in peers:
+        p.join()
+
+    for team, digest, score, rollbacks, resimulated, longest, elapsed in results:
+        print("team {0}: state {1}, score {2}-{3}, {4} rollbacks, {5} ticks resimulated, longest {6:.1f}ms, {7:.1f}s".format(
+            team, digest, score[0], score[1], rollbacks, resimulated, longest * 1000, elapsed))
+    print("in sync" if results[0][1] == results[1][1] else "DESYNC")
@@ -0,0 +1,63 @@
+import pgzrun
+import sys
+
+from controls import Controls
+from netplay import connect, RollbackSession
+from render import Renderer
+import constant
+from constant import WIDTH, HEIGHT, TITLE
+
+# Two-player match over the network, one player per computer, each using the arrow keys and space.
+#   python netsoccer.py host [PORT] [DIFFICULTY]    wait for the other player to join
+#   python netsoccer.py join HOST [PORT]            join a player waiting at HOST
+# Only inputs are sent between the two computers - see netplay.py.
+
+DEFAULT_PORT = 5757
+
+if len(sys.argv) < 2 or sys.argv[1] not in ("host", "join") or (sys.argv[1] == "join" and len(sys.argv) < 3):
+    print("Usage: python netsoccer.py host [PORT] [DIFFICULTY] | join HOST [PORT]")
+    sys.exit()
+
+if sys.argv[1] == "host":
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PORT
+    difficulty = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    print("Waiting for the other player on port {0}...".format(port))
+    link, team, seed, difficulty = connect(None, port, difficulty=difficulty, timeout=300)
+else:
+    port = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_PORT
+    link, team, seed, difficulty = connect(sys.argv[2], port)
+
+session = RollbackSession(link, team, seed, difficulty)
+controls = Controls(0)
+
+def update():
+    if not session.game.game_over():
+        session.update(controls.state())
+    else:
+        # Keep the other player up to date in case they haven't finished yet
+        session.poll()
+        session.send()
+
+def draw():
+    global renderer
+
+    if renderer is None:
+        renderer = Renderer(screen)
+
+    game = session.game
+    renderer.draw(game)
+
+    screen.blit(renderer.images.load("bar"), (constant.HALF_WINDOW_W - 176, 0))
+
+    for i in range(2):
+        screen.blit(renderer.images.load("s" + str(game.teams[i].score)), (constant.HALF_WINDOW_W + 7 - 39 * i, 6))
+
+    if game.game_over():
+        img = "over" + str(int(game.teams[1].score > game.teams[0].score))
+        screen.blit(renderer.images.load(img), (0, 0))
+    elif game.score_timer > 0:
+        screen.blit(renderer.images.load("goal"), (constant.HALF_WINDOW_W - 300, HEIGHT / 2 - 88))
+
+renderer = None
+
+pgzrun.go()
@@ -0,0 +1,132 @@
+import math
+import pygame
+import constant
+
+# Home positions for team 0 in each formation, for the standard 1000 x 1400 level, forwards first.
+# Team 1's are the same turned through 180 degrees about the centre spot. The first player of each
+# team takes kickoffs and starts under the control of a human team.
+FORMATIONS = {
+    5: [(350, 550), (650, 450), (500, 850), (350, 1200), (650, 1150)],
+    6: [(350, 550), (650, 450), (300, 850), (700, 800), (350, 1250), (650, 1150)],
+    7: constant.PLAYER_START_POS,
+    8: [(350, 550), (650, 450), (200, 850), (500, 750), (800, 950), (250, 1200), (500, 1250), (750, 1150)],
+    9: [(350, 550), (650, 450), (150, 850), (400, 800), (600, 750), (850, 900), (250, 1200), (500, 1250),
+        (750, 1150)],
+    10: [(250, 550), (500, 450), (750, 550), (150, 850), (400, 800), (600, 750), (850, 900), (250, 1200),
+         (500, 1250), (750, 1150)],
+    11: [(250, 550), (500, 450), (750, 550), (150, 850), (400, 800), (600, 750), (850, 900), (200, 1150),
+         (400, 1250), (600, 1200), (800, 1150)],
+}
+
+# Space around the pitch, between its edges and those of the level - the same whatever its size
+MARGIN_X = constant.HALF_LEVEL_W - constant.HALF_PITCH_W
+MARGIN_Y = constant.HALF_LEVEL_H - constant.HALF_PITCH_H
+
+
+def formation(team_size):
+    # Team 0's home positions for a team of team_size, on the standard level. Sizes without a
+    # table above get rows of players spread evenly over the area the tables use.
+    if team_size in FORMATIONS:
+        return FORMATIONS[team_size]
+
+    cols = math.ceil(math.sqrt(team_size))
+    rows = math.ceil(team_size / cols)
+    positions = []
+    for i in range(team_size):
+        row, col = divmod(i, cols)
+        in_row = min(cols, team_size - row * cols)
+        x = 150 + 700 * (col + 0.5) / in_row
+        y = 450 + 800 * (row + 0.5) / rows
+        positions.append((round(x), round(y)))
+    return positions
+
+
+class Pitch:
+    # The dimensions of a level, pitch and goals, and the movement rules that depend on them. Each
+    # Game has its own, so matches with different numbers of players can be played side by side.
+    # for_team_size() scales the pitch and goals so that the area per player is about the same as
+    # seven a side on the standard pitch, which is what Pitch(1) is. Distances that are about the
+    # players rather than the pitch - how far they can see, kick or run - stay the same.
+    def __init__(self, scale=1):
+        self.scale = scale
+
+        self.half_pitch_w = round(constant.HALF_PITCH_W * scale)
+        self.half_pitch_h = round(constant.HALF_PITCH_H * scale)
+        self.half_level_w = self.half_pitch_w + MARGIN_X
+        self.half_level_h = self.half_pitch_h + MARGIN_Y
+        self.level_w = self.half_level_w * 2
+        self.level_h = self.half_level_h * 2
+
+        self.goal_width = round(constant.GOAL_WIDTH * scale)
+        self.half_goal_w = self.goal_width // 2
+
+        self.pitch_bounds_x = (self.half_level_w - self.half_pitch_w, self.half_level_w + self.half_pitch_w)
+        self.pitch_bounds_y = (self.half_level_h - self.half_pitch_h, self.half_level_h + self.half_pitch_h)
+
+        self.goal_bounds_x = (self.half_level_w - self.half_goal_w, self.half_level_w + self.half_goal_w)
+        self.goal_bounds_y = (self.pitch_bounds_y[0] - constant.GOAL_DEPTH, self.pitch_bounds_y[1] + constant.GOAL_DEPTH)
+
+        self.pitch_rect = pygame.rect.Rect(self.pitch_bounds_x[0], self.pitch_bounds_y[0],
+                                           self.half_pitch_w * 2, self.half_pitch_h * 2)
+        self.goal_rects = [pygame.rect.Rect(self.goal_bounds_x[0], self.goal_bounds_y[0], self.goal_width, constant.GOAL_DEPTH),
+                           pygame.rect.Rect(self.goal_bounds_x[0], self.goal_bounds_y[1] - constant.GOAL_DEPTH,
+                                            self.goal_width, constant.GOAL_DEPTH)]
+
+        # Lead players don't chase further out than this
+        inset = constant.AI_MIN_X - MARGIN_X
+        self.ai_min_x = self.pitch_bounds_x[0] + inset
+        self.ai_max_x = self.pitch_bounds_x[1] - inset
+        self.ai_min_y = self.pitch_bounds_y[0] + inset
+        self.ai_max_y = self.pitch_bounds_y[1] - inset
+
+    @staticmethod
+    def for_team_size(team_size):
+        return Pitch(math.sqrt(max(team_size, 5) / len(constant.PLAYER_START_POS)))
+
+    def home_positions(self, team_size):
+        # Team 0's home positions, scaled about the centre spot from those on the standard level
+        return [(self.half_level_w + round((x - constant.HALF_LEVEL_W) * self.scale),
+                 self.half_level_h + round((y - constant.HALF_LEVEL_H) * self.scale))
+                for x, y in formation(team_size)]
+
+    def kickoff_y(self, home_y, team):
+        # Where a player whose home is at home_y lines up for a kickoff, in their own half
+        return home_y / 2 + self.half_level_h / 2 + round(200 * self.scale) * (1 - 2 * team)
+
+    def goal_line(self, team):
+        # y of the goal line at the end team attacks
+        return self.pitch_bounds_y[0] if team == 0 else self.pitch_bounds_y[1]
+
+    def ball_bounds(self, x, y):
+        # The x and y limits a free ball at (x, y) bounces off. Inside the goal mouth the side walls
+        # are the goal posts, and in line with the goal the ball can travel past the goal line.
+        if abs(y - self.half_level_h) > self.half_pitch_h:
+            bounds_x = self.goal_bounds_x
+        else:
+            bounds_x = self.pitch_bounds_x
+
+        if abs(x - self.half_level_w) < self.half_goal_w:
+            bounds_y = self.goal_bounds_y
+        else:
+            bounds_y = self.pitch_bounds_y
+
+        return bounds_x, bounds_y
+
+    def on_pitch(self, x, y):
+        return self.pitch_rect.collidepoint(x, y) \
+               or self.goal_rects[0].collidepoint(x, y) \
+               or self.goal_rects[1].collidepoint(x, y)
+
+    def allow_movement(self, x, y):
+        if abs(x - self.half_level_w) > self.half_level_w:
+            return False
+
+        elif abs(x - self.half_level_w) < self.half_goal_w + 20:
+            return abs(y - self.half_level_h) < self.half_pitch_h
+
+        else:
+            return abs(y - self.half_level_h) < self.half_level_h
+
+
+# The pitch seven a side is played on, and that the images are drawn for
+STANDARD = Pitch()
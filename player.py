@@ -1,17 +1,26 @@
 from pygame.math import Vector2
-import random
-import math
 import constant
-import game
+import util
 from actor import MyActor
 from goal import Goal
 
-class Player():
+# Turns considered by a CPU player with the ball, from two steps anticlockwise to two clockwise
+TURNS = range(-2, 3)
+
+# Change to a player's direction each tick, indexed by how far it is from the direction it's
+# turning to
+DIR_STEP = (0, 1, 1, 1, 1, 7, 7, 7)
+
+class Player(MyActor):
     ANCHOR = (25,37)
 
-    def __init__(self, x, y, team):
+    # Cost handicap for each of the candidate directions a CPU player with the ball considers,
+    # from two steps anticlockwise to two steps clockwise - turning is discouraged
+    TURN_HANDICAP = [2, 1, 0, 1, 2]
+
+    def __init__(self, x, y, team, game):
         
-        kickoff_y = (y / 2) + 550 - (team * 400)
+        kickoff_y = game.pitch.kickoff_y(y, team)
 
         super().__init__("blank", x, kickoff_y, Player.ANCHOR)
 
@@ -19,27 +28,44 @@ class Player():
 
         self.team = team
 
+        self.game = game
+
         self.dir = 0
 
         self.anim_frame = -1
 
         self.timer = 0
 
-        self.shadow = MyActor("blank", 0, 0, Player.ANCHOR)
+        self.lead = None
+
+        self.mark = None
 
         self.debug_target = Vector2(0, 0)
 
+    def sprite_frame(self):
+        # Animation frame to draw: 0 when standing still, otherwise 1 to 4
+        return (int(self.anim_frame) // 18) + 1
+
     def active(self):
 
-        return abs(game.ball.vpos.y - self.home.y) < 400
+        return abs(self.game.ball.vpos.y - self.home.y) < 400
 
     def update(self):
-        self.timer -= 1
+        # Positions are worked on as plain floats rather than Vector2s, with the helpers from
+        # util's scalar kernel, so that a tick creates as few objects as possible
+        game = self.game
 
-        target = Vector2(self.home)     
-        speed = constant.PLAYER_DEFAULT_SPEED
+        self.timer -= 1
 
         my_team = game.teams[self.team]
+        difficulty = my_team.difficulty
+
+        pos = self.vpos
+        x, y = pos.x, pos.y
+        home = self.home
+        target_x, target_y = home.x, home.y
+        speed = difficulty.default_speed
+
         pre_kickoff = game.kickoff_player != None
         i_am_kickoff_player = self == game.kickoff_player
         ball = game.ball
@@ -51,45 +77,55 @@ class Player():
             else:
                 speed = constant.HUMAN_PLAYER_WITHOUT_BALL_SPEED
 
-            target = self.vpos + my_team.controls.move(speed)
+            move = my_team.controls.move(speed)
+            target_x, target_y = x + move.x, y + move.y
 
         elif ball.owner != None:
             if ball.owner == self:
-              
-                costs = [game.cost(self.vpos + game.angle_to_vec(self.dir + d) * 3, self.team, abs(d)) for d in range(-2, 3)]
 
-                
-                _, target = min(costs, key=lambda element: element[0])
+                # The cheapest of five steps, from two directions anticlockwise to two clockwise
+                opponents = game.opponent_positions(self.team)
+                best = None
+                for d, handicap in zip(TURNS, Player.TURN_HANDICAP):
+                    vx, vy = util.DIRECTIONS[self.dir + d]
+                    cx = x + vx * 3
+                    cy = y + vy * 3
+                    c = game.cost(cx, cy, self.team, opponents, handicap)
+                    if best is None or c < best:
+                        best, target_x, target_y = c, cx, cy
 
-                speed = constant.CPU_PLAYER_WITH_BALL_BASE_SPEED + game.difficulty.speed_boost
+                speed = difficulty.with_ball_speed + difficulty.speed_boost
 
             elif ball.owner.team == self.team:
                 if self.active():
 
                     direction = -1 if self.team == 0 else 1
-                    target.x = (ball.vpos.x + target.x) / 2
-                    target.y = (ball.vpos.y + 400 * direction + target.y) / 2
+                    target_x = (ball.vpos.x + target_x) / 2
+                    target_y = (ball.vpos.y + 400 * direction + target_y) / 2
             else:
                 if self.lead is not None:
 
+                    owner_pos = ball.owner.vpos
+                    vx, vy = util.DIRECTIONS[ball.owner.dir]
+                    target_x = owner_pos.x + vx * self.lead
+                    target_y = owner_pos.y + vy * self.lead
 
-                    target = ball.owner.vpos + game.angle_to_vec(ball.owner.dir) * self.lead
-
-                    target.x = max(constant.AI_MIN_X, min(constant.AI_MAX_X, target.x))
-                    target.y = max(constant.AI_MIN_Y, min(constant.AI_MAX_Y, target.y))
+                    target_x = max(game.pitch.ai_min_x, min(game.pitch.ai_max_x, target_x))
+                    target_y = max(game.pitch.ai_min_y, min(game.pitch.ai_max_y, target_y))
 
                     other_team = 1 if self.team == 0 else 0
-                    speed = constant.LEAD_PLAYER_BASE_SPEED
+                    speed = difficulty.lead_speed
                     if game.teams[other_team].human():
-                        speed += game.difficulty.speed_boost
+                        speed += difficulty.speed_boost
 
                 elif self.mark.active():
 
                     if my_team.human():
           
-                        target = Vector2(ball.vpos)
+                        target_x, target_y = ball.vpos.x, ball.vpos.y
                     else:
-                        vec, length = game.safe_normalise(ball.vpos - self.mark.vpos)
+                        mark_pos = self.mark.vpos
+                        vx, vy, length = util.normalise(ball.vpos.x - mark_pos.x, ball.vpos.y - mark_pos.y)
 
                         if isinstance(self.mark, Goal):
 
@@ -97,55 +133,46 @@ class Player():
                         else:
                             length /= 2
 
-                        target = self.mark.vpos + vec * length
+                        target_x = mark_pos.x + vx * length
+                        target_y = mark_pos.y + vy * length
         else:
 
             if (pre_kickoff and i_am_kickoff_player) or (not pre_kickoff and self.active()):
                
-                target = Vector2(ball.vpos)     #
-                vel = Vector2(ball.vel)         # 
-                frame = 0
-
-       
-                while (target - self.vpos).length() > constant.PLAYER_INTERCEPT_BALL_SPEED * frame + constant.DRIBBLE_DIST_X and vel.length() > 0.5:
-                    target += vel
-                    vel *= constant.DRAG
-                    frame += 1
-
-                speed = constant.PLAYER_INTERCEPT_BALL_SPEED
+                speed = difficulty.intercept_speed
+                trajectory = ball.trajectory()
+                frame = trajectory.intercept_frame(pos, speed, constant.DRIBBLE_DIST_X)
+                target_x, target_y = trajectory.point(frame)
 
             elif pre_kickoff:
    
-                target.y = self.vpos.y
+                target_y = y
 
 
-        vec, distance = game.safe_normalise(target - self.vpos)
+        vx, vy, distance = util.normalise(target_x - x, target_y - y)
 
-        self.debug_target = Vector2(target)
+        self.debug_target = (target_x, target_y)
 
         if distance > 0:
             distance = min(distance, speed)
 
-            target_dir = game.vec_to_angle(vec)
+            target_dir = util.octant(vx, vy)
 
             
-            if game.allow_movement(self.vpos.x + vec.x * distance, self.vpos.y):
-                self.vpos.x += vec.x * distance
-            if game.allow_movement(self.vpos.x, self.vpos.y + vec.y * distance):
-                self.vpos.y += vec.y * distance
+            if game.pitch.allow_movement(x + vx * distance, y):
+                x += vx * distance
+                pos.x = x
+            if game.pitch.allow_movement(x, y + vy * distance):
+                pos.y = y + vy * distance
 
             self.anim_frame = (self.anim_frame + max(distance, 1.5)) % 72
         else:
-            target_dir = game.vec_to_angle(ball.vpos - self.vpos)
+            target_dir = util.octant(ball.vpos.x - x, ball.vpos.y - y)
             self.anim_frame = -1
 
 
         dir_diff = (target_dir - self.dir)
-        self.dir = (self.dir + [0, 1, 1, 1, 1, 7, 7, 7][dir_diff % 8]) % 8
-
-        suffix = str(self.dir) + str((int(self.anim_frame) // 18) + 1) # todo
-
-        self.image = "player" + str(self.team) + suffix
-        self.shadow.image = "players" + suffix
+        self.dir = (self.dir + DIR_STEP[dir_diff % 8]) % 8
 
-        self.shadow.vpos = Vector2(self.vpos)
\ No newline at end of file
+        game.grid.move(self)
+        game.geometry_cache = None
\ No newline at end of file
@@ -0,0 +1,189 @@
+import pygame
+from pygame.math import Vector2
+import constant
+from atlas import Images
+from timing import PITCH, ACTORS, SHADOWS, ARROWS
+from player import Player
+
+
+class SpriteTable:
+    # Every player and player shadow animation frame, loaded once up front. Indexed by
+    # [team][dir][frame] for players and [dir][frame] for shadows, where frame is
+    # Player.sprite_frame(). Every frame shares Player.ANCHOR, so drawing one is a single blit at
+    # the player's position minus the anchor, with no image lookup or anchor calculation.
+    NUM_DIRS = 8
+    NUM_FRAMES = 5
+
+    def __init__(self, images):
+        self.anchor = Player.ANCHOR
+        self.players = [[[images.load("player" + str(team) + str(dir) + str(frame)) for frame in range(self.NUM_FRAMES)]
+                         for dir in range(self.NUM_DIRS)]
+                        for team in range(2)]
+        self.shadows = [[images.load("players" + str(dir) + str(frame)) for frame in range(self.NUM_FRAMES)]
+                        for dir in range(self.NUM_DIRS)]
+
+
+class Positions:
+    # Where the ball, its shadow, each player and the camera were at the end of a tick, for drawing
+    # part of the way from there to the next tick. Kept by object, so actors replaced by a
+    # Game.reset() since (after a goal) are drawn where they are rather than sliding in from where
+    # their predecessors were, and likewise the camera.
+    def __init__(self, game):
+        self.ball = game.ball
+        self.actors = {obj: (obj.vpos.x, obj.vpos.y) for obj in [game.ball, game.ball.shadow] + game.players}
+        self.camera = (game.camera_focus.x, game.camera_focus.y)
+
+
+class Renderer:
+    # Draws a Game to a Pygame Zero screen. Simulation entities are plain objects, so images are
+    # loaded and positioned here rather than through Pygame Zero Actors. Every image is loaded when
+    # the renderer is created, from the texture atlas if one has been built (see atlas.py).
+    # draw() can be given the Positions from the tick before the game's current state and alpha,
+    # how far it is from there to now, and then draws actors and the camera between the two.
+    # On a pitch other than the standard one, the pitch and goal images are stretched to fit.
+    def __init__(self, screen, images=None):
+        self.screen = screen
+        self.images = images or Images()
+        self.surfaces = {}
+        self.scaled_surfaces = {}
+        self.sprites = SpriteTable(self.images)
+        self.previous = None
+        self.alpha = 1
+
+    def position(self, obj):
+        x, y = obj.vpos.x, obj.vpos.y
+        previous = self.previous.get(obj) if self.previous else None
+        if previous is None:
+            return x, y
+        alpha = self.alpha
+        return previous[0] + (x - previous[0]) * alpha, previous[1] + (y - previous[1]) * alpha
+
+    def draw_actor(self, obj, offset_x, offset_y):
+        # Draw an entity's image positioned by its anchor, which like a Pygame Zero Actor's defaults
+        # to the centre of the image
+        entry = self.surfaces.get(obj.image)
+        if entry is None:
+            surf = self.images.load(obj.image)
+            ax, ay = obj.anchor if obj.anchor else (surf.get_width() / 2, surf.get_height() / 2)
+            entry = self.surfaces[obj.image] = (surf, ax, ay)
+
+        surf, ax, ay = entry
+        x, y = self.position(obj)
+        self.screen.surface.blit(surf, (x - offset_x - ax, y - offset_y - ay))
+
+    def scaled(self, name, size):
+        # An image stretched to the given size, made the first time it's needed
+        surf = self.images.load(name)
+        if surf.get_size() == size:
+            return surf
+        key = (name, size)
+        if key not in self.scaled_surfaces:
+            self.scaled_surfaces[key] = pygame.transform.smoothscale(surf, size)
+        return self.scaled_surfaces[key]
+
+    def draw_goal(self, goal, pitch, offset_x, offset_y):
+        surf = self.images.load(goal.image)
+        width = round(surf.get_width() * pitch.goal_width / constant.GOAL_WIDTH)
+        surf = self.scaled(goal.image, (width, surf.get_height()))
+        self.screen.surface.blit(surf, (goal.vpos.x - offset_x - width / 2, goal.vpos.y - offset_y - surf.get_height() / 2))
+
+    def draw_player(self, p, offset_x, offset_y, shadow=False):
+        if shadow:
+            surf = self.sprites.shadows[p.dir][p.sprite_frame()]
+        else:
+            surf = self.sprites.players[p.team][p.dir][p.sprite_frame()]
+        ax, ay = self.sprites.anchor
+        x, y = self.position(p)
+        self.screen.surface.blit(surf, (x - offset_x - ax, y - offset_y - ay))
+
+    def draw(self, game, previous=None, alpha=1):
+        screen = self.screen
+        timing = game.timing
+        if timing:
+            timing.begin()
+
+        self.previous = previous.actors if previous else None
+        self.alpha = alpha
+
+        camera_x, camera_y = game.camera_focus.x, game.camera_focus.y
+        if previous and previous.ball is game.ball:
+            camera_x = previous.camera[0] + (camera_x - previous.camera[0]) * alpha
+            camera_y = previous.camera[1] + (camera_y - previous.camera[1]) * alpha
+
+        pitch = game.pitch
+        offset_x = max(0, min(pitch.level_w - constant.WIDTH, camera_x - constant.WIDTH / 2))
+        offset_y = max(0, min(pitch.level_h - constant.HEIGHT, camera_y - constant.HEIGHT / 2))
+        offset = Vector2(offset_x, offset_y)
+
+        screen.blit(self.scaled("pitch", (pitch.level_w, pitch.level_h)), (-offset_x, -offset_y))
+
+        if timing:
+            timing.lap(PITCH)
+
+        
+        objects = sorted([game.ball] + game.players, key = lambda obj: self.position(obj)[1])
+
+        self.draw_goal(game.goals[0], pitch, offset_x, offset_y)
+
+        for obj in objects:
+            if obj is game.ball:
+                self.draw_actor(obj, offset_x, offset_y)
+            else:
+                self.draw_player(obj, offset_x, offset_y)
+
+        if timing:
+            timing.lap(ACTORS)
+
+        for obj in objects:
+            if obj is game.ball:
+                self.draw_actor(obj.shadow, offset_x, offset_y)
+            else:
+                self.draw_player(obj, offset_x, offset_y, shadow=True)
+
+        if timing:
+            timing.lap(SHADOWS)
+
+        self.draw_goal(game.goals[1], pitch, offset_x, offset_y)
+
+        if timing:
+            timing.lap(ACTORS)
+
+        for t in range(2):
+            if game.teams[t].human():
+                arrow_pos = Vector2(self.position(game.teams[t].active_control_player)) - offset - Vector2(11, 45)
+                screen.blit(self.images.load("arrow" + str(t)), arrow_pos)
+
+        if constant.DEBUG_SHOW_LEADS:
+            for p in game.players:
+                if game.ball.owner and p.lead:
+                    line_start = game.ball.owner.vpos - offset
+                    line_end = p.vpos - offset
+                    pygame.draw.line(screen.surface, (0,0,0), line_start, line_end)
+
+        if constant.DEBUG_SHOW_TARGETS:
+            for p in game.players:
+                line_start = p.debug_target - offset
+                line_end = p.vpos - offset
+                pygame.draw.line(screen.surface, (255,0,0), line_start, line_end)
+
+        if constant.DEBUG_SHOW_PEERS:
+            for p in game.players:
+                line_start = p.peer.vpos - offset
+                line_end = p.vpos - offset
+                pygame.draw.line(screen.surface, (0,0,255), line_start, line_end)
+
+        if constant.DEBUG_SHOW_SHOOT_TARGET:
+            if game.debug_shoot_target and game.ball.owner:
+                line_start = game.ball.owner.vpos - offset
+                line_end = game.debug_shoot_target - offset
+                pygame.draw.line(screen.surface, (255,0,255), line_start, line_end)
+        
+        if constant.DEBUG_SHOW_COSTS and game.ball.owner:
+            grid = [Vector2(x,y) for x in range(0,pitch.level_w,60) for y in range(0, pitch.level_h, 26)]
+            for pos, c in zip(grid, game.costs(grid, game.ball.owner.team)):
+                screen_pos = pos-offset
+                screen_pos = (screen_pos.x,screen_pos.y)    
+                screen.draw.text("{0:.0f}".format(c), center=screen_pos)
+
+        if timing:
+            timing.lap(ARROWS)
@@ -0,0 +1,253 @@
+import bisect
+import struct
+import sys
+import time
+import zlib
+
+import numpy as np
+from pygame.math import Vector2
+
+from controls import UP, DOWN, LEFT, RIGHT, SHOOT
+from game import Game
+
+# Replay file layout:
+#   HEADER: magic, format version, seed, difficulty, which teams are human (bit per team), which
+#           human players had the shoot key held at the start (bit per team), final score, number
+#           of ticks, checkpoint interval, number of goals
+#   GOAL for each goal: the tick at which it appeared on the scoreboard, and the scoring team
+#   Input section: the input of each human player on each tick, INPUT_BITS bits per player per
+#           tick, packed least significant bit first
+#   Checkpoint section: for every checkpoint, CHECKPOINT (tick, shoot held bits as in the header,
+#           length) followed by Game.snapshot() from before that tick's update
+# The two sections are each compressed with zlib and preceded by their compressed length. Held
+# keys mostly stay the same from one tick to the next, and so do the random generator's state and
+# many players' home positions from one checkpoint to the next.
+MAGIC = b"SRPL"
+VERSION = 4
+HEADER = struct.Struct("<4sBQBBBBBIIH")
+GOAL = struct.Struct("<IB")
+SECTION = struct.Struct("<I")
+CHECKPOINT = struct.Struct("<IBI")
+INPUT_BITS = 5
+
+# Ticks between checkpoints - seeking simulates at most this many ticks
+CHECKPOINT_INTERVAL = 300
+
+
+def pack_bits(flags, teams):
+    return sum(1 << t for t, flag in zip(teams, flags) if flag)
+
+
+def unpack_bits(mask, teams):
+    return [bool(mask & (1 << t)) for t in teams]
+
+
+class Replay:
+    def __init__(self, seed, difficulty, humans, shoot_held, ticks, inputs, score=(0, 0),
+                 interval=CHECKPOINT_INTERVAL, checkpoints=None, goals=None):
+        self.seed = seed
+        self.difficulty = difficulty
+        self.humans = humans            # list of team numbers with human controls
+        self.shoot_held = shoot_held    # for each human, whether shoot was held at the start
+        self.ticks = ticks
+        self.inputs = inputs            # ticks x len(humans) array of Controls.state() values
+        self.score = score
+        self.interval = interval
+        self.checkpoints = checkpoints or {}    # tick: (shoot_held, snapshot)
+        self.goals = goals or []                # (tick, team) for each goal
+
+    def to_bytes(self):
+        bits = (self.inputs[:, :, np.newaxis] >> np.arange(INPUT_BITS)) & 1
+        inputs = zlib.compress(np.packbits(bits.astype(np.uint8).ravel(), bitorder="little").tobytes(), 9)
+
+        checkpoints = []
+        for tick in sorted(self.checkpoints):
+            shoot_held, state = self.checkpoints[tick]
+            checkpoints.append(CHECKPOINT.pack(tick, pack_bits(shoot_held, self.humans), len(state)) + state)
+        checkpoints = zlib.compress(b"".join(checkpoints), 9)
+
+        header = HEADER.pack(MAGIC, VERSION, self.seed, self.difficulty, pack_bits([True] * 2, self.humans),
+                             pack_bits(self.shoot_held, self.humans), self.score[0], self.score[1],
+                             self.ticks, self.interval, len(self.goals))
+
+        return b"".join([header] + [GOAL.pack(tick, team) for tick, team in self.goals]
+                        + [SECTION.pack(len(inputs)), inputs, SECTION.pack(len(checkpoints)), checkpoints])
+
+    @staticmethod
+    def from_bytes(data):
+        magic, version, seed, difficulty, human_mask, shoot_mask, score0, score1, ticks, interval, num_goals = \
+            HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a version {0} replay".format(VERSION))
+        offset = HEADER.size
+
+        humans = [t for t in range(2) if human_mask & (1 << t)]
+        shoot_held = unpack_bits(shoot_mask, humans)
+
+        goals = []
+        for i in range(num_goals):
+            goals.append(GOAL.unpack_from(data, offset))
+            offset += GOAL.size
+
+        sections = []
+        for i in range(2):
+            length, = SECTION.unpack_from(data, offset)
+            offset += SECTION.size
+            sections.append(zlib.decompress(data[offset:offset + length]))
+            offset += length
+
+        count = ticks * len(humans) * INPUT_BITS
+        bits = np.unpackbits(np.frombuffer(sections[0], np.uint8), count=count, bitorder="little")
+        bits = bits.reshape(ticks, len(humans), INPUT_BITS) << np.arange(INPUT_BITS, dtype=np.uint8)
+        inputs = bits.sum(axis=2, dtype=np.uint8)
+
+        checkpoints = {}
+        offset = 0
+        while offset < len(sections[1]):
+            tick, mask, length = CHECKPOINT.unpack_from(sections[1], offset)
+            offset += CHECKPOINT.size
+            checkpoints[tick] = (unpack_bits(mask, humans), sections[1][offset:offset + length])
+            offset += length
+
+        return Replay(seed, difficulty, humans, shoot_held, ticks, inputs, (score0, score1),
+                      interval, checkpoints, goals)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return Replay.from_bytes(f.read())
+
+
+class Recorder:
+    # Records the input of each human player in game, a checkpoint of the whole game every
+    # interval ticks, and when each goal is scored. Call update() in place of game.update() to
+    # record that tick and then simulate it.
+    def __init__(self, game, interval=CHECKPOINT_INTERVAL):
+        self.game = game
+        self.interval = interval
+        self.humans = [t for t in range(2) if game.teams[t].human()]
+        self.shoot_held = [game.teams[t].controls.shoot_held() for t in self.humans]
+        self.inputs = []
+        self.checkpoints = {}
+        self.goals = []
+
+    def update(self):
+        game = self.game
+        tick = len(self.inputs)
+
+        if tick % self.interval == 0:
+            shoot_held = [game.teams[t].controls.shoot_held() for t in self.humans]
+            self.checkpoints[tick] = (shoot_held, game.snapshot())
+
+        scores = [team.score for team in game.teams]
+
+        self.inputs.append([game.teams[t].controls.state() for t in self.humans])
+        game.update()
+
+        for t in range(2):
+            if game.teams[t].score != scores[t]:
+                self.goals.append((tick + 1, t))
+
+    def replay(self):
+        inputs = np.array(self.inputs, dtype=np.uint8).reshape(len(self.inputs), len(self.humans))
+        return Replay(self.game.seed, self.game.difficulty_level, self.humans, self.shoot_held,
+                      len(self.inputs), inputs, [team.score for team in self.game.teams],
+                      self.interval, self.checkpoints, self.goals)
+
+
+class ReplayControls:
+    # Plays back recorded input in place of Controls. The shoot button behaves like
+    # key_just_pressed: it only counts if it wasn't held the last time shoot() was checked.
+    def __init__(self, shoot_held):
+        self.input = 0
+        self.prev_shoot = shoot_held
+
+    def move(self, speed):
+        dx, dy = 0, 0
+        if self.input & LEFT:
+            dx = -1
+        elif self.input & RIGHT:
+            dx = 1
+        if self.input & UP:
+            dy = -1
+        elif self.input & DOWN:
+            dy = 1
+        return Vector2(dx, dy) * speed
+
+    def shoot(self):
+        held = bool(self.input & SHOOT)
+        result = held and not self.prev_shoot
+        self.prev_shoot = held
+        return result
+
+
+class Playback:
+    # Rebuilds a recorded match headless. self.game is the state after self.tick ticks.
+    def __init__(self, replay):
+        self.replay = replay
+
+        controls = [None, None]
+        for t, held in zip(replay.humans, replay.shoot_held):
+            controls[t] = ReplayControls(held)
+        self.controls = [controls[t] for t in replay.humans]
+
+        self.game = Game(controls[0], controls[1], replay.difficulty, seed=replay.seed)
+        self.tick = 0
+        self.checkpoint_ticks = sorted(replay.checkpoints)
+
+    def step(self):
+        for c, value in zip(self.controls, self.replay.inputs[self.tick]):
+            c.input = int(value)
+        self.game.update()
+        self.tick += 1
+
+    def seek(self, tick):
+        # Move to the state after tick ticks. Restores the nearest checkpoint at or before tick,
+        # unless the current position is already between that checkpoint and tick, then
+        # simulates forward from there.
+        tick = max(0, min(tick, self.replay.ticks))
+
+        i = bisect.bisect_right(self.checkpoint_ticks, tick) - 1
+        if i >= 0 and not (self.checkpoint_ticks[i] <= self.tick <= tick):
+            self.tick = self.checkpoint_ticks[i]
+            shoot_held, state = self.replay.checkpoints[self.tick]
+            for c, held in zip(self.controls, shoot_held):
+                c.prev_shoot = held
+            self.game.restore(state)
+
+        while self.tick < tick:
+            self.step()
+
+        return self.game
+
+
+def play_replay(replay, ticks=None):
+    # Simulate the recorded match from kickoff as fast as possible, without using checkpoints.
+    # Returns the Game after ticks ticks, or at the end of the recording.
+    playback = Playback(replay)
+    for tick in range(replay.ticks if ticks is None else min(ticks, replay.ticks)):
+        playback.step()
+    return playback.game
+
+
+if __name__ == "__main__":
+    # python replay.py FILE [TICK] - replay a whole match from kickoff, or seek straight to TICK
+    replay = Replay.load(sys.argv[1])
+
+    start = time.perf_counter()
+    if len(sys.argv) > 2:
+        ticks = int(sys.argv[2])
+        game = Playback(replay).seek(ticks)
+    else:
+        ticks = replay.ticks
+        game = play_replay(replay)
+    elapsed = time.perf_counter() - start
+
+    score = [team.score for team in game.teams]
+    print("Recorded {0}-{1} in {2} ticks, goals at ticks {3}".format(
+        replay.score[0], replay.score[1], replay.ticks, ", ".join(str(tick) for tick, team in replay.goals)))
+    print("{0}-{1} after {2} ticks, reached in {3:.3f}s".format(score[0], score[1], ticks, elapsed))
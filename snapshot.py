@@ -0,0 +1,98 @@
+import math
+import struct
+
+from pygame.math import Vector2
+
+# Fixed binary layout of everything a Game's simulation depends on, packed with a single Struct.
+# References between entities (the ball's owner, each player's mark, each team's active player,
+# the kickoff player) are stored as positions in game.players + game.goals, with -1 for None - as
+# 16-bit numbers, for the large rosters of stress tests. A lead of None is stored as NaN.
+GAME = "iBh2d"          # score_timer, scoring_team, kickoff_player, camera_focus
+TEAM = "Hh"             # score, active_control_player
+PLAYER = "6dbih"        # vpos, home, anim_frame, lead, dir, timer, mark
+BALL = "4dhi"           # vpos, vel, owner, timer
+RANDOM = "4QBI"         # PCG64 state and increment (low, high 64 bits), has_uint32, uinteger
+
+PLAYER_FIELDS = 9
+MASK_64 = (1 << 64) - 1
+
+layouts = {}
+
+
+def layout(num_players):
+    if num_players not in layouts:
+        layouts[num_players] = struct.Struct("<" + GAME + TEAM * 2 + PLAYER * num_players + BALL + RANDOM)
+    return layouts[num_players]
+
+
+def save(game):
+    index = game.entity_index
+    players = game.players
+    ball = game.ball
+
+    values = [game.score_timer, game.scoring_team, index[game.kickoff_player], game.camera_focus.x, game.camera_focus.y]
+
+    for team in game.teams:
+        values += (team.score, index[team.active_control_player])
+
+    for p in players:
+        values += (p.vpos.x, p.vpos.y, p.home.x, p.home.y, p.anim_frame,
+                   math.nan if p.lead is None else p.lead, p.dir, p.timer, index[p.mark])
+    values += (ball.vpos.x, ball.vpos.y, ball.vel.x, ball.vel.y, index[ball.owner], ball.timer)
+
+    state = game.random.bit_generator.state
+    pcg = state["state"]
+    values += (pcg["state"] & MASK_64, pcg["state"] >> 64, pcg["inc"] & MASK_64, pcg["inc"] >> 64,
+               state["has_uint32"], state["uinteger"])
+
+    return layout(len(players)).pack(*values)
+
+
+def load(game, data):
+    # Restore state saved from a game with the same number of players. The existing player, ball
+    # and goal objects are updated in place.
+    entities = game.players + game.goals + [None]
+    players = game.players
+    ball = game.ball
+    n = len(players)
+
+    values = layout(n).unpack(data)
+
+    game.score_timer, game.scoring_team = values[0], values[1]
+    game.kickoff_player = entities[values[2]]
+    game.camera_focus = Vector2(values[3], values[4])
+
+    game.teams[0].score = values[5]
+    game.teams[0].active_control_player = entities[values[6]]
+    game.teams[1].score = values[7]
+    game.teams[1].active_control_player = entities[values[8]]
+
+    start = 9
+    end = start + n * PLAYER_FIELDS
+    for i, p in enumerate(players):
+        offset = start + i * PLAYER_FIELDS
+        x, y, home_x, home_y, p.anim_frame, lead, p.dir, p.timer, mark = values[offset:offset + PLAYER_FIELDS]
+        p.vpos = Vector2(x, y)
+        p.home = Vector2(home_x, home_y)
+        p.lead = None if math.isnan(lead) else lead
+        p.mark = entities[mark]
+
+    x, y, vel_x, vel_y, owner, ball.timer = values[end:end + 6]
+    ball.vpos = Vector2(x, y)
+    ball.vel = Vector2(vel_x, vel_y)
+
+    ball.owner = entities[owner]
+    ball.shadow.vpos = Vector2(x, y)
+    ball.cached_trajectory = None
+
+    state_low, state_high, inc_low, inc_high, has_uint32, uinteger = values[end + 6:]
+    game.random.bit_generator.state = {"bit_generator": "PCG64",
+                                       "state": {"state": state_low | (state_high << 64), "inc": inc_low | (inc_high << 64)},
+                                       "has_uint32": has_uint32, "uinteger": uinteger}
+
+    game.debug_shoot_target = None
+    game.geometry_cache = None
+
+    # The grid already holds these player objects, so only those that changed cell need moving
+    for p in players:
+        game.grid.move(p)
@@ -0,0 +1,120 @@
+import math
+
+
+class SpatialGrid:
+    # Uniform grid over the level for proximity queries on entities with a vpos. Each entity keeps
+    # the order it was added in, and every query breaks ties and returns results in that order, so
+    # a query gives the same answer as the equivalent scan over the original list.
+    # Distances are measured with Vector2.length() so they match the scans they replace exactly.
+    def __init__(self, width, height, cell_size):
+        self.cell_size = cell_size
+        self.cols = math.ceil(width / cell_size)
+        self.rows = math.ceil(height / cell_size)
+        self.cells = [[] for i in range(self.cols * self.rows)]
+        self.cell_of = {}
+        self.order = {}
+
+    def cell_coords(self, pos):
+        col = int(pos.x // self.cell_size)
+        row = int(pos.y // self.cell_size)
+        if col < 0:
+            col = 0
+        elif col >= self.cols:
+            col = self.cols - 1
+        if row < 0:
+            row = 0
+        elif row >= self.rows:
+            row = self.rows - 1
+        return col, row
+
+    def rebuild(self, entities):
+        for cell in self.cells:
+            cell.clear()
+        self.cell_of.clear()
+        self.order.clear()
+
+        for i, entity in enumerate(entities):
+            col, row = self.cell_coords(entity.vpos)
+            cell = col + row * self.cols
+            self.cells[cell].append(entity)
+            self.cell_of[entity] = cell
+            self.order[entity] = i
+
+    def move(self, entity):
+        # Call after an entity's vpos changes
+        col, row = self.cell_coords(entity.vpos)
+        cell = col + row * self.cols
+        old_cell = self.cell_of[entity]
+        if cell != old_cell:
+            self.cells[old_cell].remove(entity)
+            self.cells[cell].append(entity)
+            self.cell_of[entity] = cell
+
+    def _cells_in_box(self, min_col, min_row, max_col, max_row):
+        min_col, max_col = max(0, min_col), min(self.cols - 1, max_col)
+        cells = []
+        for row in range(max(0, min_row), min(self.rows - 1, max_row) + 1):
+            cells += self.cells[min_col + row * self.cols:max_col + 1 + row * self.cols]
+        return cells
+
+    def radius(self, pos, radius, where=None):
+        # Entities within radius of pos (inclusive), in insertion order
+        min_col, min_row = self.cell_coords(pos - (radius, radius))
+        max_col, max_row = self.cell_coords(pos + (radius, radius))
+
+        found = [entity for cell in self._cells_in_box(min_col, min_row, max_col, max_row) for entity in cell
+                 if (entity.vpos - pos).length() <= radius and (where is None or where(entity))]
+        found.sort(key=self.order.__getitem__)
+        return found
+
+    def nearest(self, pos, k=1, where=None, key=None, min_scale=1):
+        # The k entities nearest to pos, nearest first. key, if given, replaces straight-line
+        # distance as the sort key, and must never be less than min_scale times that distance -
+        # this is what lets the search stop before visiting every cell.
+        if key is None:
+            key = lambda entity: (entity.vpos - pos).length()
+
+        col, row = self.cell_coords(pos)
+        candidates = []
+        ring = 0
+        max_ring = max(col, row, self.cols - 1 - col, self.rows - 1 - row)
+
+        while ring <= max_ring:
+            for cell in self._ring(col, row, ring):
+                for entity in cell:
+                    if where is None or where(entity):
+                        candidates.append((key(entity), self.order[entity], entity))
+
+            if len(candidates) >= k:
+                candidates.sort(key=lambda c: (c[0], c[1]))
+                del candidates[k:]
+
+                # Anything not yet visited lies outside the square of cells searched so far
+                left = (col - ring) * self.cell_size
+                top = (row - ring) * self.cell_size
+                right = (col + ring + 1) * self.cell_size
+                bottom = (row + ring + 1) * self.cell_size
+                bound = min(pos.x - left, right - pos.x, pos.y - top, bottom - pos.y) * min_scale
+                if candidates[-1][0] < bound:
+                    break
+
+            ring += 1
+
+        candidates.sort(key=lambda c: (c[0], c[1]))
+        return [entity for _, _, entity in candidates[:k]]
+
+    def _ring(self, col, row, ring):
+        # Cells on the boundary of the square of side 2 * ring + 1 centred on (col, row)
+        if ring == 0:
+            return [self.cells[col + row * self.cols]]
+
+        min_col, max_col = max(0, col - ring), min(self.cols - 1, col + ring)
+        cells = []
+        for r in (row - ring, row + ring):
+            if 0 <= r < self.rows:
+                cells += self.cells[min_col + r * self.cols:max_col + 1 + r * self.cols]
+        for r in range(max(0, row - ring + 1), min(self.rows, row + ring)):
+            for c in (col - ring, col + ring):
+                if 0 <= c < self.cols:
+                    cells.append(self.cells[c + r * self.cols])
+        return cells
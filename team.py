@@ -1,8 +1,9 @@
 class Team:
-    def __init__(self, controls):
+    def __init__(self, controls, difficulty=None):
         self.controls = controls
+        self.difficulty = difficulty
         self.active_control_player = None
         self.score = 0
 
     def human(self):
-        return self.controls != None
\ No newline at end of file
+        return self.controls != None
@@ -0,0 +1,57 @@
+import time
+
+import numpy as np
+
+# Phases of a frame, in the order they happen. The first six are the parts of Game.update, the
+# rest the layers drawn by Renderer.draw and the front end.
+PHASES = ["score", "leads", "players", "ball", "switching", "camera",
+          "pitch", "actors", "shadows", "arrows", "hud"]
+SCORE, LEADS, PLAYERS, BALL, SWITCHING, CAMERA, PITCH, ACTORS, SHADOWS, ARROWS, HUD = range(len(PHASES))
+
+
+class FrameTiming:
+    # Time spent in each phase of the last capacity frames, kept in a ring buffer. Code being
+    # timed calls begin() at the start of a run of phases and lap(phase) at the end of each one,
+    # which adds the time since the previous begin() or lap() to that phase. end_frame() moves on to
+    # the next row, so a frame covers however many updates and draws happened since the last one.
+    def __init__(self, capacity=600):
+        self.times = np.zeros((capacity, len(PHASES)))
+        self.current = [0.0] * len(PHASES)
+        self.frames = 0
+        self.last = time.perf_counter()
+
+    def begin(self):
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        self.times[self.frames % len(self.times)] = self.current
+        self.current = [0.0] * len(PHASES)
+        self.frames += 1
+
+    def recent(self):
+        # The recorded frames, oldest first, in seconds: one row per frame, one column per phase
+        count = min(self.frames, len(self.times))
+        start = self.frames % len(self.times) if self.frames > len(self.times) else 0
+        return np.roll(self.times[:count], -start, axis=0)
+
+    def percentiles(self, q):
+        # For each phase, and then for whole frames, the q'th percentile time in milliseconds
+        recent = self.recent()
+        if len(recent) == 0:
+            return np.zeros(len(PHASES) + 1)
+        with_total = np.column_stack([recent, recent.sum(axis=1)])
+        return np.percentile(with_total, q, axis=0) * 1000
+
+    def save_csv(self, path):
+        # One line per recorded frame, oldest first, with each phase's time in milliseconds
+        recent = self.recent()
+        first = self.frames - len(recent)
+        with open(path, "w") as f:
+            f.write(",".join(["frame"] + PHASES + ["total"]) + "\n")
+            for i, row in enumerate(recent.tolist()):
+                f.write(",".join([str(first + i)] + ["{0:.4f}".format(t * 1000) for t in row + [sum(row)]]) + "\n")
@@ -0,0 +1,257 @@
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sqlite3
+import time
+
+from difficulty import Difficulty
+from game import DIFFICULTY, play_match
+import constant
+
+# Modules whose code decides how a match plays out. The engine version is a hash of their source,
+# so results cached by an earlier version of the simulation are never reused.
+ENGINE_MODULES = ["actor", "ball", "constant", "cost", "difficulty", "game", "geometry", "goal", "kinematics",
+                  "pitch", "player", "spatial", "team", "trajectory", "util"]
+
+# The presets, which are played when no configurations are given
+PRESETS = {"easy": DIFFICULTY[0], "medium": DIFFICULTY[1], "hard": DIFFICULTY[2]}
+
+ELO_START = 1500
+ELO_K = 32
+
+# Matches still going after this many ticks are stopped and go to whoever is ahead, so a
+# configuration that can't score doesn't hold up a worker forever. Matches usually last about
+# 18,000 ticks, so this only stops ones that have stalled.
+MAX_TICKS = 30000
+
+
+def engine_version():
+    h = hashlib.sha1()
+    for name in ENGINE_MODULES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name + ".py"), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
+def config_params(difficulty):
+    return {"goalie_enabled": bool(difficulty.goalie_enabled),
+            "second_lead_enabled": bool(difficulty.second_lead_enabled),
+            "speed_boost": float(difficulty.speed_boost),
+            "holdoff_timer": int(difficulty.holdoff_timer),
+            "cost_weights": [float(w) for w in difficulty.cost_weights],
+            "default_speed": float(difficulty.default_speed),
+            "intercept_speed": float(difficulty.intercept_speed),
+            "with_ball_speed": float(difficulty.with_ball_speed),
+            "lead_speed": float(difficulty.lead_speed)}
+
+
+def config_hash(difficulty):
+    # Identifies a configuration by its settings, whatever it's called
+    return hashlib.sha1(json.dumps(config_params(difficulty), sort_keys=True).encode()).hexdigest()[:16]
+
+
+def load_configs(path):
+    # Configurations from a JSON file mapping each name to the arguments of a Difficulty, such as
+    #   {"cautious": {"goalie_enabled": true, "second_lead_enabled": false, "speed_boost": 0.1,
+    #                 "holdoff_timer": 90, "cost_weights": [3500, 6000, 200]}}
+    # cost_weights and the speeds may be left out, for the standard ones.
+    with open(path) as f:
+        return {name: Difficulty(**params) for name, params in json.load(f).items()}
+
+
+class ResultCache:
+    # Results of matches already played, in an SQLite database, so that running a tournament
+    # again only plays the matches it hasn't seen. A result is keyed by the hashes of the two
+    # configurations (team 0's first), the seed, the team size and the engine version.
+    def __init__(self, path, engine=None):
+        self.engine = engine or engine_version()
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (home TEXT, away TEXT, seed INTEGER, "
+                                "team_size INTEGER, engine TEXT, score0 INTEGER, score1 INTEGER, ticks INTEGER, "
+                                "PRIMARY KEY (home, away, seed, team_size, engine))")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS configs (hash TEXT PRIMARY KEY, params TEXT)")
+        self.connection.commit()
+
+    def get(self, home, away, seed, team_size):
+        # (score0, score1, ticks), or None if the match hasn't been played
+        return self.connection.execute("SELECT score0, score1, ticks FROM results WHERE home = ? AND away = ? AND "
+                                       "seed = ? AND team_size = ? AND engine = ?",
+                                       (home, away, seed, team_size, self.engine)).fetchone()
+
+    def put(self, home, away, seed, team_size, result):
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                (home, away, seed, team_size, self.engine) + tuple(result))
+        self.connection.commit()
+
+    def add_config(self, difficulty):
+        # Record what a hash stands for, for anyone looking at the database
+        self.connection.execute("INSERT OR IGNORE INTO configs VALUES (?, ?)",
+                                (config_hash(difficulty), json.dumps(config_params(difficulty), sort_keys=True)))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def run_match(job):
+    # Play one match between two configurations, given as Difficulty arguments, for at most
+    # max_ticks ticks, and return its key and result
+    home, away, seed, team_size, max_ticks, params = job
+    game, ticks = play_match([Difficulty(**p) for p in params], max_ticks, seed, team_size)
+    return (home, away, seed), (game.teams[0].score, game.teams[1].score, ticks)
+
+
+def finished(score0, score1):
+    return max(score0, score1) == constant.WINNING_SCORE
+
+
+def expected_score(rating, other):
+    return 1 / (1 + 10 ** ((other - rating) / 400))
+
+
+class Tournament:
+    # Matches between named configurations (Difficulty objects), with Elo ratings and a points
+    # table. Each pairing plays games matches: on seeds seed, seed + 1, ..., with each seed
+    # played once with each configuration as team 0, so neither gets the better of the draw.
+    # Results are looked up in cache first, and only the missing matches are played, over a
+    # process pool. Ratings are updated one match at a time in a fixed order, so they don't
+    # depend on which matches were cached or which worker finished first.
+    # A match that nobody has won after max_ticks ticks (None for no limit) is stopped and scored
+    # as it stands, as the tuner does. The cache keeps how long each match ran, so a stopped match
+    # is only reused while the limit is the same, and a finished one only if it finished within
+    # the limit.
+    def __init__(self, configs, cache, games=2, seed=0, team_size=None, processes=None, max_ticks=MAX_TICKS):
+        self.configs = dict(configs)
+        self.names = list(self.configs)
+        self.cache = cache
+        self.games = games
+        self.seed = seed
+        self.team_size = team_size
+        self.processes = processes
+        self.max_ticks = max_ticks
+
+        self.ratings = {name: ELO_START for name in self.names}
+        self.points = {name: 0 for name in self.names}
+        self.records = {name: [0, 0, 0] for name in self.names}   # wins, draws, losses
+        self.played = set()
+        self.matches_played = 0
+        self.matches_cached = 0
+        self.matches_stopped = 0
+
+        for difficulty in self.configs.values():
+            cache.add_config(difficulty)
+
+    def fixtures(self, a, b):
+        # (team 0's name, team 1's name, seed) of each match between a and b
+        return [(a, b, self.seed + g // 2) if g % 2 == 0 else (b, a, self.seed + g // 2) for g in range(self.games)]
+
+    def play(self, pairings):
+        # Play every match of each (name, name) pairing and update the tables from them. Results
+        # are keyed by the number of players a side the match is actually played with, so leaving
+        # out team_size and giving the default are the same match.
+        team_size = self.team_size or len(constant.PLAYER_START_POS)
+        fixtures = [f for a, b in pairings for f in self.fixtures(a, b)]
+        hashes = {name: config_hash(difficulty) for name, difficulty in self.configs.items()}
+
+        results = {}
+        jobs = []
+        for home, away, seed in fixtures:
+            result = self.cache.get(hashes[home], hashes[away], seed, team_size)
+            if result is None or not self.reusable(*result):
+                params = [config_params(self.configs[home]), config_params(self.configs[away])]
+                jobs.append((hashes[home], hashes[away], seed, team_size, self.max_ticks, params))
+            else:
+                results[hashes[home], hashes[away], seed] = result
+                self.matches_cached += 1
+
+        # Two names with the same settings are the same job
+        jobs = list({job[:3]: job for job in jobs}.values())
+        if jobs:
+            with multiprocessing.Pool(self.processes) as pool:
+                for key, result in pool.imap_unordered(run_match, jobs):
+                    self.cache.put(*key, team_size, result)
+                    results[key] = result
+                    self.matches_played += 1
+
+        for home, away, seed in fixtures:
+            score0, score1, ticks = results[hashes[home], hashes[away], seed]
+            if not finished(score0, score1):
+                # Stopped at max_ticks
+                self.matches_stopped += 1
+            self.record(home, away, score0, score1)
+        self.played.update(frozenset(pairing) for pairing in pairings)
+
+    def reusable(self, score0, score1, ticks):
+        # Whether a cached result is what playing the match with the current max_ticks would give
+        if self.max_ticks is not None and ticks > self.max_ticks:
+            return False
+        return finished(score0, score1) or ticks == self.max_ticks
+
+    def record(self, home, away, score0, score1):
+        result = 1 if score0 > score1 else 0.5 if score0 == score1 else 0
+        change = ELO_K * (result - expected_score(self.ratings[home], self.ratings[away]))
+        self.ratings[home] += change
+        self.ratings[away] -= change
+
+        self.points[home] += result
+        self.points[away] += 1 - result
+        outcome = 0 if result == 1 else 1 if result == 0.5 else 2
+        self.records[home][outcome] += 1
+        self.records[away][2 - outcome] += 1
+
+    def round_robin(self):
+        self.play(list(itertools.combinations(self.names, 2)))
+
+    def swiss(self, rounds):
+        # Each round pairs configurations with similar ratings that haven't met yet (if there's
+        # one left) - the highest rated with the next highest it can play, and so on. With an odd
+        # number, the lowest rated left over sits the round out.
+        for r in range(rounds):
+            order = sorted(self.names, key=lambda name: (-self.ratings[name], self.names.index(name)))
+            pairings = []
+            while len(order) > 1:
+                a = order.pop(0)
+                b = next((name for name in order if frozenset((a, name)) not in self.played), order[0])
+                order.remove(b)
+                pairings.append((a, b))
+            self.play(pairings)
+
+    def standings(self):
+        return [{"name": name, "rating": round(self.ratings[name], 1), "points": self.points[name],
+                 "wins": self.records[name][0], "draws": self.records[name][1], "losses": self.records[name][2],
+                 "config": config_hash(self.configs[name])}
+                for name in sorted(self.names, key=lambda name: -self.ratings[name])]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play AI configurations against each other and rate them")
+    parser.add_argument("configs", nargs="?", default=None, help="JSON file of configurations (default: the presets)")
+    parser.add_argument("-f", "--format", choices=["round-robin", "swiss"], default="round-robin")
+    parser.add_argument("-r", "--rounds", type=int, default=3, help="rounds of a Swiss tournament")
+    parser.add_argument("-g", "--games", type=int, default=2, help="matches per pairing")
+    parser.add_argument("--db", default="tournament.db")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="default: one per core")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--team-size", type=int, default=None)
+    parser.add_argument("--max-ticks", type=int, default=MAX_TICKS, help="0 to play every match to the end")
+    args = parser.parse_args()
+
+    configs = load_configs(args.configs) if args.configs else PRESETS
+    cache = ResultCache(args.db)
+    tournament = Tournament(configs, cache, args.games, args.seed, args.team_size, args.processes,
+                            args.max_ticks or None)
+
+    start = time.perf_counter()
+    if args.format == "swiss":
+        tournament.swiss(args.rounds)
+    else:
+        tournament.round_robin()
+    elapsed = time.perf_counter() - start
+    cache.close()
+
+    print(json.dumps({"standings": tournament.standings(), "played": tournament.matches_played,
+                      "cached": tournament.matches_cached, "stopped": tournament.matches_stopped,
+                      "seconds": round(elapsed, 2)}, indent=2))
@@ -0,0 +1,66 @@
+import bisect
+import math
+import numpy as np
+import util
+
+# Players stop predicting the ball's path once it slows to this speed
+MIN_INTERCEPT_VEL = 0.5
+
+class Trajectory:
+    # The path a free ball will follow from a given position and velocity, one point per frame,
+    # with drag and bounces applied exactly as Ball.update applies them. The path ends at the
+    # first frame where the ball's speed has dropped to MIN_INTERCEPT_VEL.
+    def __init__(self, pos, vel, pitch):
+        x, y = pos.x, pos.y
+        vel_x, vel_y = vel.x, vel.y
+
+        points = []
+        speeds = []
+
+        while True:
+            speed = math.sqrt(vel_x * vel_x + vel_y * vel_y)
+            points.append((x, y))
+            speeds.append(-speed)
+            if speed <= MIN_INTERCEPT_VEL:
+                break
+
+            bounds_x, bounds_y = pitch.ball_bounds(x, y)
+            x, vel_x = util.ball_physics(x, vel_x, bounds_x)
+            y, vel_y = util.ball_physics(y, vel_y, bounds_y)
+
+        self.points = np.array(points)
+
+        # Negated so they're in ascending order for bisect - the ball only ever slows down
+        self.neg_speeds = speeds
+
+    def point(self, frame):
+        # The ball's position at frame, as an (x, y) tuple of floats
+        return self.points.item(frame, 0), self.points.item(frame, 1)
+
+    def intercept_frame(self, pos, speed, reach):
+        # First frame at which a player at pos, running at speed, can get within reach of the ball,
+        # or the last frame of the path if there is none.
+        # Whether the ball is reachable at frame f isn't monotonic in f while the ball is moving
+        # faster than the player, as it can run back out of range. So frames up to the point where
+        # the ball slows to the player's speed are checked in one vectorised pass, and only after
+        # that, where reachability can no longer be lost, is a binary search used.
+        last = len(self.points) - 1
+        slow_from = bisect.bisect_left(self.neg_speeds, -speed)
+
+        if slow_from > 0:
+            dx = self.points[:slow_from, 0] - pos.x
+            dy = self.points[:slow_from, 1] - pos.y
+            reachable = np.sqrt(dx * dx + dy * dy) <= speed * np.arange(slow_from) + reach
+            if reachable.any():
+                return int(reachable.argmax())
+
+        lo, hi = slow_from, last
+        while lo < hi:
+            mid = (lo + hi) // 2
+            x, y = self.points[mid]
+            dx, dy = x - pos.x, y - pos.y
+            if math.sqrt(dx * dx + dy * dy) <= speed * mid + reach:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
@@ -0,0 +1,211 @@
+import argparse
+import json
+import math
+import multiprocessing
+import time
+
+import numpy as np
+
+from difficulty import Difficulty
+from game import DIFFICULTY
+from multimatch import MatchBatch
+from tournament import config_params
+
+# The settings searched, with the range each is drawn from, besides goalie_enabled and
+# second_lead_enabled. The speeds are the per-team versions of the *_SPEED constants in
+# constant.py that CPU players move at - see Difficulty.
+RANGES = {
+    "speed_boost": (0, 0.4),
+    "holdoff_timer": (30, 150),
+    "default_speed": (1.6, 2.4),
+    "intercept_speed": (2.3, 3.2),
+    "with_ball_speed": (2.2, 3.0),
+    "lead_speed": (2.5, 3.3),
+}
+
+# Names given to the presets found, in order of target win rate
+PRESET_NAMES = ["easy", "medium", "hard"]
+
+
+def sample_configs(count, rng):
+    # count random configurations, speeds rounded to 0.05 and timers to whole ticks
+    configs = []
+    for i in range(count):
+        params = {"goalie_enabled": bool(rng.integers(2)), "second_lead_enabled": bool(rng.integers(2))}
+        for name, (lo, hi) in RANGES.items():
+            value = rng.uniform(lo, hi)
+            params[name] = int(round(value)) if name == "holdoff_timer" else round(value * 20) / 20
+        configs.append(Difficulty(**params))
+    return configs
+
+
+def wilson(points, matches, z):
+    # Confidence interval for a win rate, counting a draw as half a win
+    if matches == 0:
+        return 0, 1
+    p = points / matches
+    scale = 1 + z * z / matches
+    centre = (p + z * z / (2 * matches)) / scale
+    half = z * math.sqrt(p * (1 - p) / matches + z * z / (4 * matches * matches)) / scale
+    return max(0, centre - half), min(1, centre + half)
+
+
+def play_chunk(job):
+    # Play a chunk of matches in one MatchBatch. fixtures are (configuration number, its
+    # Difficulty arguments, seed, which team it plays as); returns each configuration's points.
+    fixtures, reference, team_size, max_ticks = job
+    reference = Difficulty(**reference)
+    difficulty = []
+    for c, params, seed, side in fixtures:
+        d = Difficulty(**params)
+        difficulty.append((d, reference) if side == 0 else (reference, d))
+
+    batch = MatchBatch([seed for c, params, seed, side in fixtures], difficulty, team_size)
+    scores, ended = batch.play(max_ticks)
+
+    results = []
+    for (c, params, seed, side), score in zip(fixtures, scores):
+        own, other = score[side], score[1 - side]
+        results.append((c, 1 if own > other else 0.5 if own == other else 0))
+    return results
+
+
+class Tuner:
+    # Finds configurations whose win rate against a reference configuration is as close as
+    # possible to each of a list of targets, by racing: every configuration plays round_matches
+    # more matches against the reference each round, and drops out once its win rate's confidence
+    # interval has separated from that of a better candidate for every target - that is, once even
+    # the best case for its distance from each target is worse than the worst case of another
+    # configuration's. The race ends when one configuration is left for each target, or after
+    # max_matches matches each. Matches alternate which team the configuration plays as, and
+    # configurations all use the same seeds, so they're compared on the same draws.
+    # Each round's matches are split into chunks of up to chunk matches, each played as one
+    # MatchBatch, over a pool of processes. Matches are cut off after max_ticks ticks (None for
+    # none) and go to whoever is ahead.
+    def __init__(self, configs, reference, targets, round_matches=8, max_matches=64, z=1.96, seed=0,
+                 team_size=None, max_ticks=None, processes=None, chunk=256):
+        self.configs = list(configs)
+        self.reference = reference
+        self.targets = list(targets)
+        self.round_matches = round_matches
+        self.max_matches = max_matches
+        self.z = z
+        self.seed = seed
+        self.team_size = team_size
+        self.max_ticks = max_ticks
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunk = chunk
+
+        self.points = [0] * len(self.configs)
+        self.matches = [0] * len(self.configs)
+        self.alive = set(range(len(self.configs)))
+        self.rounds = 0
+        self.total_matches = 0
+
+    def win_rate(self, c):
+        return self.points[c] / self.matches[c] if self.matches[c] else 0.5
+
+    def distance_bounds(self, c, target):
+        # Least and greatest distance of configuration c's true win rate from target, within its
+        # confidence interval
+        lo, hi = wilson(self.points[c], self.matches[c], self.z)
+        nearest = 0 if lo <= target <= hi else min(abs(lo - target), abs(hi - target))
+        return nearest, max(abs(lo - target), abs(hi - target))
+
+    def contenders(self, target):
+        bounds = {c: self.distance_bounds(c, target) for c in self.alive}
+        best_worst_case = min(worst for nearest, worst in bounds.values())
+        return [c for c in sorted(self.alive) if bounds[c][0] <= best_worst_case]
+
+    def play_round(self, pool):
+        fixtures = []
+        for c in sorted(self.alive):
+            params = config_params(self.configs[c])
+            for g in range(self.matches[c], self.matches[c] + self.round_matches):
+                fixtures.append((c, params, self.seed + g // 2, g % 2))
+
+        # Big enough chunks to make the most of MatchBatch, small enough to keep every process busy
+        size = max(1, min(self.chunk, math.ceil(len(fixtures) / self.processes)))
+        jobs = [(fixtures[i:i + size], config_params(self.reference), self.team_size, self.max_ticks)
+                for i in range(0, len(fixtures), size)]
+        for results in pool.imap_unordered(play_chunk, jobs):
+            for c, points in results:
+                self.points[c] += points
+                self.matches[c] += 1
+
+        self.rounds += 1
+        self.total_matches += len(fixtures)
+
+    def run(self):
+        with multiprocessing.Pool(self.processes) as pool:
+            while True:
+                self.play_round(pool)
+                kept = [self.contenders(target) for target in self.targets]
+                self.alive = set(c for contenders in kept for c in contenders)
+                if all(len(contenders) == 1 for contenders in kept) \
+                        or all(self.matches[c] >= self.max_matches for c in self.alive):
+                    break
+        return self.best()
+
+    def best(self):
+        # The configuration nearest each target, out of those still in the race
+        chosen = []
+        for target in self.targets:
+            contenders = self.contenders(target)
+            chosen.append(min(contenders, key=lambda c: (abs(self.win_rate(c) - target), -self.matches[c])))
+        return chosen
+
+    def report(self, chosen):
+        presets = {}
+        for name, target, c in zip(PRESET_NAMES + ["preset{0}".format(i) for i in range(3, len(self.targets))],
+                                   self.targets, chosen):
+            lo, hi = wilson(self.points[c], self.matches[c], self.z)
+            presets[name] = {"target": target, "win_rate": round(self.win_rate(c), 3),
+                             "interval": [round(lo, 3), round(hi, 3)], "matches": self.matches[c],
+                             "config": config_params(self.configs[c])}
+        return presets
+
+
+def preset_source(difficulty):
+    # A Difficulty(...) expression for the preset table in game.py, leaving out settings that
+    # are the defaults
+    params = config_params(difficulty)
+    default = config_params(Difficulty(False, False, 0, 0))
+    args = [repr(params[name]) for name in ["goalie_enabled", "second_lead_enabled", "speed_boost", "holdoff_timer"]]
+    args += ["{0}={1!r}".format(name, tuple(value) if name == "cost_weights" else value)
+             for name, value in list(params.items())[4:] if value != default[name]]
+    return "Difficulty({0})".format(", ".join(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search for difficulty presets with given win rates against a reference")
+    parser.add_argument("-n", "--configs", type=int, default=300, help="random configurations to try")
+    parser.add_argument("-t", "--targets", type=float, nargs="+", default=[0.25, 0.5, 0.75],
+                        help="win rates wanted against the reference")
+    parser.add_argument("-r", "--reference", type=int, default=1, choices=range(3), help="level of the reference")
+    parser.add_argument("-o", "--output", default="presets.json", help="where to write the preset table")
+    parser.add_argument("--round-matches", type=int, default=8)
+    parser.add_argument("--max-matches", type=int, default=64)
+    parser.add_argument("--max-ticks", type=int, default=7200, help="0 to play every match to the end")
+    parser.add_argument("--z", type=float, default=1.96, help="width of the confidence intervals")
+    parser.add_argument("-j", "--processes", type=int, default=None, help="default: one per core")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--team-size", type=int, default=None)
+    args = parser.parse_args()
+
+    # The current presets take part too, so the table only changes if something better turns up
+    configs = DIFFICULTY + sample_configs(args.configs, np.random.default_rng(args.seed))
+    tuner = Tuner(configs, DIFFICULTY[args.reference], sorted(args.targets), args.round_matches, args.max_matches,
+                  args.z, args.seed, args.team_size, args.max_ticks or None, args.processes)
+
+    start = time.perf_counter()
+    chosen = tuner.run()
+    elapsed = time.perf_counter() - start
+
+    presets = tuner.report(chosen)
+    with open(args.output, "w") as f:
+        json.dump({name: preset["config"] for name, preset in presets.items()}, f, indent=2)
+
+    print(json.dumps({"presets": presets, "configs": len(configs), "rounds": tuner.rounds,
+                      "matches": tuner.total_matches, "seconds": round(elapsed, 2)}, indent=2))
+    print("DIFFICULTY = [{0}]".format(", ".join(preset_source(configs[c]) for c in chosen)))
@@ -0,0 +1,84 @@
+import math
+from pygame.math import Vector2
+import constant
+
+def sin(x):
+    return math.sin(x*math.pi/4)
+
+def cos(x):
+    return sin(x+2)
+
+
+def vec_to_angle(vec):
+
+    return octant(vec.x, vec.y)
+
+
+def angle_to_vec(angle):
+    return Vector2(DIRECTIONS[angle]) if angle in DIRECTIONS else Vector2(sin(angle), -cos(angle))
+
+
+def safe_normalise(vec):
+    length = vec.length()
+    if length == 0:
+        return Vector2(0,0), 0
+    else:
+        return vec.normalize(), length
+
+def ball_physics(pos, vel, bounds):
+    pos += vel
+
+    if pos < bounds[0] or pos > bounds[1]:
+        pos, vel = pos - vel, -vel
+
+    return pos, vel * constant.DRAG
+
+def avg(a, b):
+    return b if abs(b-a) < 1 else (a+b)/2
+
+
+# Scalar versions of the helpers above for the code that runs every tick, working on plain floats
+# and tuples so as not to create Vector2s. Each gives exactly the same results as the helper it
+# stands in for.
+
+# sin() and cos() of each of the eight directions
+SIN = [sin(angle) for angle in range(8)]
+COS = [cos(angle) for angle in range(8)]
+
+# angle_to_vec() as an (x, y) tuple, for each direction and for up to two steps either side of
+# them, as a player turning considers. Angles outside 0-7 don't give quite the same values as the
+# direction they're equivalent to, so they have entries of their own.
+DIRECTIONS = {angle: (sin(angle), -cos(angle)) for angle in range(-2, 10)}
+
+# The tangent of half an octant. Beyond this ratio of sideways to forwards, a vector is in the next
+# octant round.
+TAN_HALF_OCTANT = math.tan(math.pi / 8)
+
+def octant(x, y):
+    # The direction (0 = up, 2 = right and so on) nearest the vector (x, y), as vec_to_angle works
+    # it out with atan2, but by comparing the components. Within a whisker of the boundary between
+    # two octants (or for a zero vector), where rounding could make the two ways disagree, atan2
+    # decides.
+    ax = abs(x)
+    ay = abs(y)
+    sideways = ax - ay * TAN_HALF_OCTANT
+    forwards = ay - ax * TAN_HALF_OCTANT
+    margin = (ax + ay) * 1e-9
+    if -margin <= sideways <= margin or -margin <= forwards <= margin:
+        return int(4 * math.atan2(x, -y) / math.pi + 8.5) % 8
+    elif sideways < 0:
+        return 0 if y < 0 else 4
+    elif forwards < 0:
+        return 2 if x > 0 else 6
+    elif x > 0:
+        return 1 if y < 0 else 3
+    else:
+        return 7 if y < 0 else 5
+
+def normalise(x, y):
+    # safe_normalise() for the vector (x, y): returns the unit vector's components and the length
+    length = math.sqrt(x * x + y * y)
+    if length == 0:
+        return 0.0, 0.0, 0
+    else:
+        return x / length, y / length, length